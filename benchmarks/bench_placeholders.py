@@ -0,0 +1,85 @@
+"""
+Compare the ``SpanProtector`` single-pass tokenizer with the previous ``re.findall`` plus ``str.replace`` one.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_placeholders.py --placeholders 10 100 1000 --repeat 20
+
+No database is needed, texts are generated with the requested number of placeholders between words. Each size
+is also timed on a text of as many unclosed braces, which are not placeholders and must not slow the scan down.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from django_restful_translator.placeholders import SpanProtector  # noqa: E402
+
+
+def previous_replace_placeholders_with_tokens(text):
+    placeholders = re.findall(r'\{.*?\}', text)
+    tokens = {}
+    counter = 1
+    for placeholder in placeholders:
+        token = f"__TOKEN{counter}__"
+        counter += 1
+        tokens[token] = placeholder
+        text = text.replace(placeholder, token)
+    return text, tokens
+
+
+def previous_replace_tokens_with_placeholders(text, tokens):
+    for token, placeholder in tokens.items():
+        text = text.replace(token, placeholder)
+    return text
+
+
+def make_text(placeholders):
+    return ' '.join(f'Some words to translate around {{field_{number}}}.' for number in range(placeholders))
+
+
+def make_unbalanced_text(braces):
+    return 'a{ ' * braces
+
+
+def measure(label, func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f'{label:<45} median {timings[len(timings) // 2] * 1000:9.3f} ms   min {timings[0] * 1000:9.3f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--placeholders', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    protector = SpanProtector()
+    for placeholders in args.placeholders:
+        text = make_text(placeholders)
+        print(f'-- {placeholders} placeholders, {len(text)} characters')
+        previous_text, tokens = previous_replace_placeholders_with_tokens(text)
+        protected_text, spans = protector.protect(text)
+        assert previous_replace_tokens_with_placeholders(previous_text, tokens) == text
+        assert protector.restore(protected_text, spans) == text
+
+        measure('previous protect', lambda: previous_replace_placeholders_with_tokens(text), args.repeat)
+        measure('SpanProtector.protect', lambda: protector.protect(text), args.repeat)
+        measure('previous restore', lambda: previous_replace_tokens_with_placeholders(previous_text, tokens),
+                args.repeat)
+        measure('SpanProtector.restore', lambda: protector.restore(protected_text, spans), args.repeat)
+        unbalanced_text = make_unbalanced_text(placeholders)
+        assert protector.protect(unbalanced_text) == (unbalanced_text, [])
+        measure('SpanProtector.protect, unclosed braces', lambda: protector.protect(unbalanced_text), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Compare translation lookups on the ``object_id`` text column with the typed ``object_int_id`` column.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_typed_object_key.py --rows 10000000 --db /tmp/drt_bench.sqlite3
+
+Point ``DJANGO_SETTINGS_MODULE`` at your own settings to run it against another database, the tables are
+created with ``migrate`` and filled only when they are empty.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'example_project')]
+
+
+def setup(db_path):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'example_project.settings')
+    import django
+    from django.conf import settings
+
+    if os.environ['DJANGO_SETTINGS_MODULE'] == 'example_project.settings':
+        settings.DATABASES['default']['NAME'] = db_path
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def fill(rows, chunk_size=50000):
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import transaction
+    from example_app.models import ExampleModel
+    from django_restful_translator.models import Translation
+
+    if Translation.objects.exists():
+        return
+    languages = [lang_code for lang_code, lang_name in django_settings().LANGUAGES]
+    fields = ExampleModel.translatable_fields
+    per_object = len(languages) * len(fields)
+    objects = rows // per_object
+    content_type = ContentType.objects.get_for_model(ExampleModel)
+
+    for start in range(1, objects + 1, chunk_size):
+        stop = min(start + chunk_size, objects + 1)
+        with transaction.atomic():
+            ExampleModel.objects.bulk_create(
+                [ExampleModel(id=pk, name=f'name {pk}', description=f'description {pk}') for pk in range(start, stop)]
+            )
+            Translation.objects.bulk_create([
+                Translation(content_type=content_type, object_id=str(pk), object_int_id=pk, language=language,
+                            field_name=field, field_value=f'{field} {pk} {language}')
+                for pk in range(start, stop) for language in languages for field in fields
+            ], batch_size=5000)
+        print(f'{min(stop - 1, objects) * per_object} rows', file=sys.stderr)
+
+
+def django_settings():
+    from django.conf import settings
+    return settings
+
+
+def measure(label, func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f'{label:<45} median {timings[len(timings) // 2] * 1000:9.2f} ms   min {timings[0] * 1000:9.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--db', default=os.path.join(ROOT, 'benchmarks', 'drt_bench.sqlite3'))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--page', type=int, default=50)
+    args = parser.parse_args()
+
+    setup(args.db)
+    fill(args.rows)
+
+    from django.contrib.contenttypes.models import ContentType
+    from django.db.models import CharField, OuterRef, Subquery
+    from django.db.models.functions import Cast
+    from example_app.models import ExampleModel
+    from django_restful_translator.models import Translation
+
+    content_type = ContentType.objects.get_for_model(ExampleModel)
+    language = [lang_code for lang_code, lang_name in django_settings().LANGUAGES][-1]
+    max_pk = ExampleModel.objects.order_by('-pk').values_list('pk', flat=True).first()
+    print(f'{Translation.objects.count()} translations, {max_pk} objects')
+
+    def page_ids():
+        start = random.randint(1, max(max_pk - args.page, 1))
+        return list(range(start, start + args.page))
+
+    def text_lookup():
+        list(Translation.objects.filter(content_type=content_type, language=language,
+                                        object_id__in=[str(pk) for pk in page_ids()]))
+
+    def typed_lookup():
+        list(Translation.objects.filter(content_type=content_type, language=language, object_int_id__in=page_ids()))
+
+    def annotated_page(key):
+        start = random.randint(1, max(max_pk - args.page, 1))
+        outer = Cast(OuterRef('pk'), CharField()) if key == 'object_id' else OuterRef('pk')
+        translations = Translation.objects.filter(content_type=content_type, language=language,
+                                                  field_name='name', **{key: outer})
+        list(ExampleModel.objects.filter(pk__gte=start).order_by('pk').annotate(
+            name_translated=Subquery(translations.values('field_value')[:1]))[:args.page])
+
+    def latest_update():
+        Translation.objects.filter(language=language).latest('updated_at')
+
+    print('-- baseline schema (unique_together index only)')
+    with new_indexes_removed():
+        measure('page lookup on object_id (text)', text_lookup, args.repeat)
+        measure('translated page join on object_id (cast)', lambda: annotated_page('object_id'), args.repeat)
+        measure('latest updated_at for a language', latest_update, max(args.repeat // 5, 1))
+    print('-- typed object key and covering indexes')
+    measure('page lookup on object_id (text)', text_lookup, args.repeat)
+    measure('page lookup on object_int_id', typed_lookup, args.repeat)
+    measure('translated page join on object_id (cast)', lambda: annotated_page('object_id'), args.repeat)
+    measure('translated page join on object_int_id', lambda: annotated_page('object_int_id'), args.repeat)
+    measure('latest updated_at for a language', latest_update, args.repeat)
+
+
+@contextmanager
+def new_indexes_removed():
+    from django.db import connection
+    from django_restful_translator.models import Translation
+
+    indexes = Translation._meta.indexes
+    with connection.schema_editor() as editor:
+        for index in indexes:
+            editor.remove_index(Translation, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(Translation, index)
+
+
+if __name__ == '__main__':
+    main()
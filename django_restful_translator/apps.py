@@ -0,0 +1,23 @@
+from django.apps import AppConfig
+
+
+class DjangoRestfulTranslatorConfig(AppConfig):
+    name = 'django_restful_translator'
+    default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from django_restful_translator import signals
+        from django_restful_translator.models import Translation
+
+        post_save.connect(signals.invalidate_translation_cache, sender=Translation,
+                          dispatch_uid='drt_invalidate_translation_cache_save')
+        post_delete.connect(signals.invalidate_translation_cache, sender=Translation,
+                            dispatch_uid='drt_invalidate_translation_cache_delete')
+        post_save.connect(signals.invalidate_object_translation_cache,
+                          dispatch_uid='drt_invalidate_object_translation_cache_save')
+        post_delete.connect(signals.invalidate_object_translation_cache,
+                            dispatch_uid='drt_invalidate_object_translation_cache_delete')
+        post_save.connect(signals.record_object_change, dispatch_uid='drt_record_object_change')
+        post_delete.connect(signals.record_object_deletion, dispatch_uid='drt_record_object_deletion')
@@ -0,0 +1,182 @@
+import re
+from collections import defaultdict, namedtuple
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;:。！？])(\s+)')
+WORD_BOUNDARY = re.compile(r'(\s+)')
+
+
+class BatchLimits(namedtuple('BatchLimits', ['max_items', 'max_characters', 'max_bytes'])):
+    """Limits of one provider request, None for no limit."""
+
+    @classmethod
+    def for_provider(cls, provider, single=False):
+        return cls(1 if single else provider.batch_size, provider.max_characters, provider.max_bytes)
+
+    def fits(self, items, characters, size):
+        return ((self.max_items is None or items <= self.max_items)
+                and (self.max_characters is None or characters <= self.max_characters)
+                and (self.max_bytes is None or size <= self.max_bytes))
+
+
+def get_size(text):
+    return len(text), len(text.encode())
+
+
+class Batch:
+    def __init__(self):
+        self.items = []
+        self.characters = 0
+        self.size = 0
+
+    def add(self, item, characters, size):
+        self.items.append(item)
+        self.characters += characters
+        self.size += size
+
+    def fits(self, limits, characters, size):
+        return limits.fits(len(self.items) + 1, self.characters + characters, self.size + size)
+
+
+def pack_batches(items, limits, key=None, window=None, group=None):
+    """
+    Group ``items`` (texts, or objects whose text is ``key(item)``) in batches within ``limits``.
+
+    Items are read ``window`` at a time (20 full batches by default), sorted from the longest to the shortest and
+    put in the first batch of the window they fit in, so short texts fill the space left by long ones. An item
+    too large for any batch is yielded alone, ``split_texts`` cuts it down. With ``group``, only items with the
+    same ``group(item)`` share a batch, and each group fills windows of its own.
+    """
+    window = window or (limits.max_items or 50) * 20
+    pending = defaultdict(list)
+    for item in items:
+        items_of_group = pending[group(item) if group else None]
+        items_of_group.append(item)
+        if len(items_of_group) >= window:
+            yield from pack_window(items_of_group, limits, key)
+            items_of_group.clear()
+    for items_of_group in pending.values():
+        if items_of_group:
+            yield from pack_window(items_of_group, limits, key)
+
+
+def pack_window(items, limits, key=None):
+    sized = [(item, *get_size(key(item) if key else item)) for item in items]
+    sized.sort(key=lambda entry: entry[1], reverse=True)
+    batches = []
+    for item, characters, size in sized:
+        batch = next((batch for batch in batches if batch.fits(limits, characters, size)), None)
+        if batch is None:
+            batch = Batch()
+            batches.append(batch)
+        batch.add(item, characters, size)
+    return [batch.items for batch in batches]
+
+
+def iter_requests(texts, limits):
+    """Split ``texts`` in consecutive groups within ``limits``, keeping their order."""
+    batch = Batch()
+    for text in texts:
+        characters, size = get_size(text)
+        if batch.items and not batch.fits(limits, characters, size):
+            yield batch.items
+            batch = Batch()
+        batch.add(text, characters, size)
+    if batch.items:
+        yield batch.items
+
+
+def split_text(text, limits, protected=None):
+    """
+    Cut ``text`` in pieces within the character and byte limits of one item, at sentence boundaries when
+    possible, then at whitespace, then anywhere, but never inside a match of ``protected`` (the markup around
+    protected spans). Returns the pieces and the separators found between them.
+    """
+    if limits.fits(1, *get_size(text)):
+        return [text], []
+    for pattern in (SENTENCE_BOUNDARY, WORD_BOUNDARY):
+        parts = split_outside(pattern, text, protected)
+        if len(parts) > 1:
+            return merge_parts(parts, limits, protected)
+    return cut_text(text, limits, protected)
+
+
+def split_outside(pattern, text, protected=None):
+    """``pattern.split(text)`` for a pattern matching separators, skipping those inside matches of ``protected``."""
+    if protected is None:
+        return pattern.split(text)
+    spans = [match.span() for match in protected.finditer(text)]
+    parts = []
+    position = 0
+    index = 0
+    for match in pattern.finditer(text):
+        while index < len(spans) and spans[index][1] <= match.start():
+            index += 1
+        if index < len(spans) and spans[index][0] < match.end():
+            continue
+        parts.extend((text[position:match.start()], match.group()))
+        position = match.end()
+    parts.append(text[position:])
+    return parts
+
+
+def merge_parts(parts, limits, protected=None):
+    """Join consecutive ``parts`` (texts alternating with separators) while the result fits in one item."""
+    pieces, separators = [], []
+
+    def add_piece(piece):
+        piece_pieces, piece_separators = split_text(piece, limits, protected)
+        pieces.extend(piece_pieces)
+        separators.extend(piece_separators)
+
+    piece = parts[0]
+    for separator, part in zip(parts[1::2], parts[2::2]):
+        if limits.fits(1, *get_size(piece + separator + part)):
+            piece += separator + part
+        else:
+            add_piece(piece)
+            separators.append(separator)
+            piece = part
+    add_piece(piece)
+    return pieces, separators
+
+
+def cut_text(text, limits, protected=None):
+    # Matches of ``protected`` are cut as a whole, alone in a piece when even they don't fit.
+    units = []
+    position = 0
+    for match in protected.finditer(text) if protected else ():
+        units.extend(text[position:match.start()])
+        units.append(match.group())
+        position = match.end()
+    units.extend(text[position:])
+    pieces = ['']
+    for unit in units:
+        if pieces[-1] and not limits.fits(1, *get_size(pieces[-1] + unit)):
+            pieces.append('')
+        pieces[-1] += unit
+    return pieces, [''] * (len(pieces) - 1)
+
+
+def split_texts(texts, limits, protected=None):
+    """
+    Split every text with ``split_text``, ``protected`` matching what must not be cut. Returns all the pieces, in
+    order, and the layout ``join_texts`` needs to put the translated pieces back together.
+    """
+    pieces, layout = [], []
+    for text in texts:
+        text_pieces, separators = split_text(text, limits, protected)
+        pieces.extend(text_pieces)
+        layout.append(separators)
+    return pieces, layout
+
+
+def join_texts(pieces, layout):
+    texts = []
+    position = 0
+    for separators in layout:
+        text = pieces[position]
+        for i, separator in enumerate(separators):
+            text += separator + pieces[position + i + 1]
+        texts.append(text)
+        position += len(separators) + 1
+    return texts
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+KEY_PREFIX = 'drt'
+
+
+def is_enabled():
+    return getattr(settings, 'DRT_CACHE_ALIAS', None) is not None
+
+
+def get_cache():
+    return caches[settings.DRT_CACHE_ALIAS]
+
+
+def get_timeout():
+    return getattr(settings, 'DRT_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def make_key(content_type_id, object_id, language):
+    return f'{KEY_PREFIX}:{content_type_id}:{object_id}:{language}'
+
+
+def get_many(content_type_id, object_ids, languages):
+    """
+    Return the cached ``{field_name: value}`` maps as ``{(object_id, language): values}``.
+
+    Missing pairs are simply absent from the result.
+    """
+    keys = {
+        make_key(content_type_id, object_id, language): (str(object_id), language)
+        for object_id in object_ids
+        for language in languages
+    }
+    found = get_cache().get_many(list(keys))
+    return {keys[key]: values for key, values in found.items()}
+
+
+def set_many(content_type_id, values_by_object):
+    """Store ``{(object_id, language): {field_name: value}}`` maps."""
+    get_cache().set_many(
+        {
+            make_key(content_type_id, object_id, language): values
+            for (object_id, language), values in values_by_object.items()
+        },
+        timeout=get_timeout(),
+    )
+
+
+def invalidate(content_type_id, object_id, languages=None):
+    if languages is None:
+        languages = [lang_code for lang_code, lang_name in settings.LANGUAGES]
+    get_cache().delete_many([make_key(content_type_id, object_id, language) for language in languages])
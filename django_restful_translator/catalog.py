@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import get_language, trans_real
+
+
+class GettextCatalog:
+    """
+    Direct access to the gettext catalogs of every language (``LOCALE_PATHS`` included, so ``drt_locale`` too).
+
+    Lookups go straight to the per-language translation objects, without activating languages or building lazy
+    proxies, so a message can be resolved in all languages with a single call.
+    """
+
+    def __init__(self):
+        self._translations = {}
+
+    def get_translation_object(self, language):
+        translation_object = self._translations.get(language)
+        if translation_object is None:
+            translation_object = self._translations[language] = trans_real.translation(language)
+        return translation_object
+
+    def gettext(self, message, language=None):
+        if not message:
+            return message
+        language = language or get_language() or settings.LANGUAGE_CODE
+        eol_message = message.replace('\r\n', '\n').replace('\r', '\n')
+        return self.get_translation_object(language).gettext(eol_message)
+
+    def gettext_all(self, message):
+        """Return ``{language: translated message}`` for every language in ``settings.LANGUAGES``."""
+        return {lang_code: self.gettext(message, lang_code) for lang_code, lang_name in settings.LANGUAGES}
+
+    def clear(self):
+        self._translations = {}
+
+
+catalog = GettextCatalog()
+
+
+@receiver(setting_changed)
+def reset_catalog(*, setting, **kwargs):
+    if setting in {'LANGUAGES', 'LANGUAGE_CODE', 'LOCALE_PATHS', 'INSTALLED_APPS'}:
+        catalog.clear()
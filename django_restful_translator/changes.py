@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from django_restful_translator.models import TranslatableObjectChange
+
+
+def is_enabled():
+    return getattr(settings, 'DRT_TRACK_CHANGES', False)
+
+
+def get_watermark_margin():
+    """
+    How long before the previous export an incremental one starts reading (``DRT_WATERMARK_MARGIN`` seconds), so
+    changes stamped before it but committed after it, or by a server with a lagging clock, are not missed.
+    """
+    return timedelta(seconds=getattr(settings, 'DRT_WATERMARK_MARGIN', 60))
+
+
+def record_changes(model, object_ids, deleted=False):
+    """Record that the ``model`` objects with these primary keys were saved, or deleted, just now."""
+    content_type = ContentType.objects.get_for_model(model)
+    now = timezone.now()
+    changes = [
+        TranslatableObjectChange(content_type=content_type, object_id=str(object_id), deleted=deleted, changed_at=now)
+        for object_id in object_ids
+    ]
+    db = router.db_for_write(TranslatableObjectChange)
+    manager = TranslatableObjectChange.objects.using(db)
+    if getattr(connections[db].features, 'supports_update_conflicts_with_target', False):
+        manager.bulk_create(
+            changes,
+            update_conflicts=True,
+            unique_fields=['content_type', 'object_id'],
+            update_fields=['deleted', 'changed_at'],
+        )
+        return
+    with transaction.atomic(using=db):
+        existing = dict(manager.filter(
+            content_type=content_type, object_id__in=[change.object_id for change in changes]
+        ).values_list('object_id', 'pk'))
+        for change in changes:
+            change.pk = existing.get(change.object_id)
+        manager.bulk_update([change for change in changes if change.pk], ['deleted', 'changed_at'])
+        manager.bulk_create([change for change in changes if not change.pk])
+
+
+def get_changed_objects(model, since):
+    """Primary keys of the ``model`` objects saved or deleted since ``since``."""
+    object_ids = TranslatableObjectChange.objects.filter(
+        content_type=ContentType.objects.get_for_model(model), changed_at__gte=since
+    ).values_list('object_id', flat=True)
+    return {model._meta.pk.to_python(object_id) for object_id in object_ids}
@@ -1,17 +1,18 @@
-from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from django_restful_translator.catalog import catalog
+
 
 class GetTextCharField(serializers.CharField):
     def to_representation(self, value):
-        return str(_(value)) or value
+        return catalog.gettext(value) or value
 
 
 class GetTextListField(serializers.ListField):
     def to_representation(self, values):
         output = []
         for value in values:
-            output.append(str(_(value)) or value)
+            output.append(catalog.gettext(value) or value)
         return output
 
 
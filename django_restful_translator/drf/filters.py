@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.utils.translation import get_language
+from rest_framework import filters
+
+from django_restful_translator.models import TranslatableQuerySet, get_translated_annotation_name
+
+
+def get_translated_lookups(queryset, field_names):
+    """
+    Map the translatable fields among ``field_names`` to their annotation in the active language.
+
+    Returns the annotated queryset and the mapping, which is empty when the default language is active.
+    """
+    language = get_language()
+    if language == settings.LANGUAGE_CODE or not isinstance(queryset, TranslatableQuerySet):
+        return queryset, {}
+    fields = [field_name for field_name in queryset.model.translatable_fields if field_name in field_names]
+    if not fields:
+        return queryset, {}
+    mapping = {field_name: get_translated_annotation_name(field_name, language) for field_name in fields}
+    return queryset.annotate_translated(language, *fields), mapping
+
+
+class TranslatedOrderingFilter(filters.OrderingFilter):
+    """
+    ``OrderingFilter`` that orders translatable fields by their value in the active language.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+
+        queryset, mapping = get_translated_lookups(queryset, [term.lstrip('-') for term in ordering])
+        ordering = [
+            ('-' if term.startswith('-') else '') + mapping.get(term.lstrip('-'), term.lstrip('-'))
+            for term in ordering
+        ]
+        return queryset.order_by(*ordering)
+
+
+class TranslatedSearchFilter(filters.SearchFilter):
+    """
+    ``SearchFilter`` that searches translatable fields by their value in the active language.
+    """
+    translated_search_fields = None
+
+    def get_search_fields(self, view, request):
+        search_fields = super().get_search_fields(view, request)
+        if not search_fields or not self.translated_search_fields:
+            return search_fields
+        return [self.translate_search_field(search_field) for search_field in search_fields]
+
+    def translate_search_field(self, search_field):
+        prefix = search_field[0] if search_field[0] in self.lookup_prefixes else ''
+        field_name = search_field[len(prefix):]
+        return prefix + self.translated_search_fields.get(field_name, field_name)
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = super().get_search_fields(view, request)
+        if search_fields and self.get_search_terms(request):
+            field_names = [field[1:] if field[0] in self.lookup_prefixes else field for field in search_fields]
+            queryset, self.translated_search_fields = get_translated_lookups(queryset, field_names)
+        return super().filter_queryset(request, queryset, view)
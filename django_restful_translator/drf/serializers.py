@@ -1,17 +1,67 @@
 from django.conf import settings
-from django.contrib.contenttypes.models import ContentType
+from django.db import connections, models, router, transaction
 from django.utils import translation
 from rest_framework import serializers
+from rest_framework.utils import model_meta
+
+from django_restful_translator import changes as object_changes
+from django_restful_translator.catalog import catalog
+from django_restful_translator.storage import get_storage
+from django_restful_translator.utils import attach_translations, get_translation, save_translations
+from .fields import AutoTranslatableJsonField
+
+
+class TranslatableListSerializer(serializers.ListSerializer):
+    """
+    Loads the translations of a whole page of objects with one query before serializing them.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        languages = self.child.get_translation_languages()
+        if not languages:
+            return super().to_representation(iterable)
+
+        if isinstance(iterable, models.QuerySet):
+            iterable = get_storage(iterable.model).prepare_queryset(iterable, languages)
+        instances = list(iterable)
+        attach_translations(instances, languages)
+        return [
+            self.child.to_representation(item) for item in instances
+        ]
 
-from django_restful_translator.models import Translation
-from django_restful_translator.utils import get_translation
-from .fields import GetTextCharField, AutoTranslatableJsonField
+    def create(self, validated_data):
+        if hasattr(self.child, 'create_many'):
+            return self.child.create_many(validated_data)
+        return super().create(validated_data)
+
+
+class TranslationPrefetchMixin:
+    """
+    Makes ``many=True`` serializers use ``TranslatableListSerializer`` unless the Meta picks another list class.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            cls.Meta = type('Meta', (meta,), {'list_serializer_class': TranslatableListSerializer})
 
+    @classmethod
+    def get_translation_languages(cls):
+        return [lang_code for lang_code, lang_name in settings.LANGUAGES]
 
-class TranslatableDBSerializer(serializers.ModelSerializer):
+
+class TranslatableDBSerializer(TranslationPrefetchMixin, serializers.ModelSerializer):
     class Meta:
         model = None
 
+    @classmethod
+    def get_translation_languages(cls):
+        # The default language is served from the model itself.
+        user_language = translation.get_language()
+        return [user_language] if user_language != settings.LANGUAGE_CODE else []
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         for field_name in instance.translatable_fields:
@@ -20,7 +70,7 @@ class TranslatableDBSerializer(serializers.ModelSerializer):
         return data
 
 
-class TranslatableDBDictSerializer(serializers.ModelSerializer):
+class TranslatableDBDictSerializer(TranslationPrefetchMixin, serializers.ModelSerializer):
     class Meta:
         model = None
 
@@ -34,7 +84,9 @@ class TranslatableDBDictSerializer(serializers.ModelSerializer):
         return data
 
 
-class TranslatableWritableDBDictSerializer(serializers.ModelSerializer):
+class TranslatableWritableDBDictSerializer(TranslationPrefetchMixin, serializers.ModelSerializer):
+    bulk_batch_size = 1000
+
     class Meta:
         model = None  # Set your model
 
@@ -56,16 +108,51 @@ class TranslatableWritableDBDictSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         translations_data = self.extract_translations_data(validated_data)
-        instance = super().create(validated_data)
-        self.update_translations(instance, translations_data, skip_primary=True)
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            self.update_translations(instance, translations_data, skip_primary=True)
         return instance
 
     def update(self, instance, validated_data):
         translations_data = self.extract_translations_data(validated_data)
-        instance = super().update(instance, validated_data)
-        self.update_translations(instance, translations_data, skip_primary=True)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            self.update_translations(instance, translations_data, skip_primary=True)
         return instance
 
+    def create_many(self, validated_data):
+        """
+        Create the objects of a ``many=True`` payload with one bulk insert, then write all their translations
+        with chunked bulk upserts.
+        """
+        model = self.Meta.model
+        relations = model_meta.get_field_info(model).relations
+        if model._meta.parents or any(
+                field in relations and relations[field].to_many for attrs in validated_data for field in attrs):
+            # bulk_create supports neither multi-table inheritance nor many-to-many values.
+            with transaction.atomic():
+                return [self.create(attrs) for attrs in validated_data]
+
+        translations_data = [self.extract_translations_data(attrs) for attrs in validated_data]
+        instances = [model(**attrs) for attrs in validated_data]
+        db = router.db_for_write(model)
+        with transaction.atomic(using=db):
+            if connections[db].features.can_return_rows_from_bulk_insert:
+                model._default_manager.using(db).bulk_create(instances, batch_size=self.bulk_batch_size)
+                # ``bulk_create`` sends no ``post_save``.
+                if object_changes.is_enabled():
+                    object_changes.record_changes(model, [instance.pk for instance in instances])
+            else:
+                for instance in instances:
+                    instance.save(using=db)
+            changes = [self.get_translation_changes(data) for data in translations_data]
+            save_translations(
+                list(zip(instances, changes)),
+                batch_size=self.bulk_batch_size,
+                created=True
+            )
+        return instances
+
     def extract_translations_data(self, validated_data):
         translations_data = {}
         for field in self.Meta.model.translatable_fields:
@@ -81,53 +168,64 @@ class TranslatableWritableDBDictSerializer(serializers.ModelSerializer):
 
         return translations_data
 
+    def get_translation_changes(self, translations_data):
+        return {
+            (field, lang_code): text
+            for field, value in translations_data.items()
+            for lang_code, text in value.items()
+            if lang_code != settings.LANGUAGE_CODE
+        }
+
     def update_translations(self, instance, translations_data, skip_primary=False):
-        for field, value in translations_data.items():
-            for lang_code, text in value.items():
-                if skip_primary and lang_code == settings.LANGUAGE_CODE:
-                    continue
-                self.set_translation(instance, field, lang_code, text)
+        # The default language lives on the model itself, so it is never stored as a translation.
+        save_translations([(instance, self.get_translation_changes(translations_data))])
+        instance.clear_translation_cache()
 
     def set_translation(self, instance, field, lang_code, text):
         if lang_code != settings.LANGUAGE_CODE:
-            Translation.objects.update_or_create(
-                content_type=ContentType.objects.get_for_model(instance),
-                object_id=instance.id,
-                field_name=field,
-                language=lang_code,
-                defaults={'field_value': text}
-            )
+            save_translations([(instance, {(field, lang_code): text})])
+            instance.clear_translation_cache()
 
 
-class TranslatableGettextSerializer(serializers.ModelSerializer):
+class TranslatableGettextSerializer(TranslationPrefetchMixin, serializers.ModelSerializer):
     class Meta:
         model = None
 
+    @classmethod
+    def get_translation_languages(cls):
+        # Values come from the gettext catalogs, not from the database.
+        return []
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         for field_name in instance.translatable_fields:
             if field_name in self.fields:
                 value = getattr(instance, field_name)
-                data[field_name] = GetTextCharField().to_representation(value)
+                data[field_name] = catalog.gettext(value) or value
         return data
 
 
-class TranslatableGettextDictSerializer(serializers.ModelSerializer):
+class TranslatableGettextDictSerializer(TranslationPrefetchMixin, serializers.ModelSerializer):
     class Meta:
         model = None
 
+    @classmethod
+    def get_translation_languages(cls):
+        # Values come from the gettext catalogs, not from the database.
+        return []
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         for field_name in instance.translatable_fields:
             if field_name in self.fields:
+                value = getattr(instance, field_name)
+                translated_values = catalog.gettext_all(value)
                 translations = {}
                 for lang_code, lang_name in settings.LANGUAGES:
-                    value = getattr(instance, field_name)
                     if lang_code == settings.LANGUAGE_CODE:
                         translations[lang_code] = value
-                    with translation.override(lang_code):
-                        translated_value = GetTextCharField().to_representation(value)
-                        if value != translated_value:
-                            translations[lang_code] = translated_value
+                    translated_value = translated_values[lang_code] or value
+                    if value != translated_value:
+                        translations[lang_code] = translated_value
                 data[field_name] = translations
         return data
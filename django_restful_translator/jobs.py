@@ -0,0 +1,46 @@
+from django.apps import apps
+from django.utils import timezone
+
+from django_restful_translator.models import TranslationJobItem
+from django_restful_translator.storage import TranslationRecord, get_storage
+
+
+def get_record_key(record):
+    """What a job item stores to identify ``record``: model label, object id, field name and language."""
+    return record.model._meta.label, record.object_id, record.field_name, record.language
+
+
+def dump_records(records):
+    return [[*get_record_key(record), record.source_value] for record in records]
+
+
+def load_records(rows):
+    records = []
+    for label, object_id, field_name, language, source_value in rows:
+        model = apps.get_model(label)
+        object_pk = model._meta.pk.to_python(object_id)
+        records.append(TranslationRecord(get_storage(model), model, object_pk, field_name, language, source_value, ''))
+    return records
+
+
+def add_item(job, records):
+    """Record a batch of ``job`` before it is sent to the provider."""
+    return TranslationJobItem.objects.create(job=job, records=dump_records(records))
+
+
+def get_unfinished_items(job):
+    """The items of ``job`` whose batch is still pending or failed."""
+    return list(job.items.exclude(status=TranslationJobItem.STATUS_DONE).order_by('pk'))
+
+
+def get_planned_keys(job):
+    """``get_record_key`` of every record of ``job`` that has an item."""
+    return {tuple(row[:4]) for records in job.items.values_list('records', flat=True) for row in records}
+
+
+def finish_items(items, batch_size=500):
+    """Save the status, results and errors of ``items``."""
+    now = timezone.now()
+    for item in items:
+        item.updated_at = now
+    TranslationJobItem.objects.bulk_update(items, ['status', 'results', 'error', 'updated_at'], batch_size=batch_size)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django_restful_translator.models import Translation
+
+
+class Command(BaseCommand):
+    help = 'Fill the typed object key columns of existing translations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=10000,
+            help='Number of translations updated per query'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = Translation.objects.filter(
+            object_int_id__isnull=True,
+            object_uuid__isnull=True
+        ).only('id', 'object_id').order_by('id')
+
+        last_id = 0
+        updated = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            for trans in chunk:
+                trans.set_typed_object_key()
+            with transaction.atomic():
+                Translation.objects.bulk_update(chunk, ['object_int_id', 'object_uuid'])
+            last_id = chunk[-1].id
+            updated += len(chunk)
+            self.stdout.write(f'Processed {updated} translations')
+
+        self.stdout.write(self.style.SUCCESS(f'Typed object keys filled for {updated} translations'))
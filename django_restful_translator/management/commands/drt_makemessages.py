@@ -1,62 +1,103 @@
 import os
-import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import polib
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 
-from django_restful_translator.utils import fetch_translatable_fields, get_po_file_path, get_po_metadata
+from django_restful_translator import changes
+from django_restful_translator.po import WATERMARK_HEADER, POBuilder, get_reference, get_watermark
+from django_restful_translator.storage import get_storage
+from django_restful_translator.utils import (
+    fetch_translatable_fields,
+    get_changed_objects,
+    get_po_file_path,
+    get_po_metadata,
+    get_translatable_models,
+)
 
 
 class Command(BaseCommand):
     help = 'Generate .po files from DB translations'
 
-    def generate_po_for_language(self, language_set):
-        language = language_set[0]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only merge the objects and translations changed since the previous export of each language into '
+                 'its .po file, removing the objects deleted since. Requires DRT_TRACK_CHANGES'
+        )
+
+    def load_po_builder(self, language):
         po_file_path = get_po_file_path(language)
 
         if os.path.isfile(po_file_path):
             po = polib.pofile(po_file_path)
         else:
             po = polib.POFile()
-
-        translations = fetch_translatable_fields(language)
-
-        for trans in translations:
-            self.write_to_po_file(po, trans)
-
-        po.metadata = get_po_metadata()
-        po.save(po_file_path)
-
-    def write_to_po_file(self, po, trans):
-        msgid_value = getattr(trans.content_object, trans.field_name)
-
-        # Find existing entry in po file by msgid
-        existing_entry = po.find(msgid_value)
-
-        comment = f"{trans.content_object._meta.model_name}__{trans.field_name}__{trans.object_id}"
-
-        # If the msgid already exists, append a comment; otherwise, add a new entry.
-        if existing_entry:
-            if comment not in existing_entry.tcomment:
-                existing_entry.tcomment += f"\n{comment}"
-        else:
-            entry = polib.POEntry(
-                msgid=msgid_value,
-                msgstr=trans.field_value,
-                tcomment=comment
-            )
-            if not trans.field_value:
-                entry.flags.append('fuzzy')
-            po.append(entry)
+        return POBuilder(po)
+
+    def save_po_builder(self, language, builder):
+        builder.po.metadata = get_po_metadata()
+        if self.watermark is not None:
+            builder.po.metadata[WATERMARK_HEADER] = self.watermark.isoformat()
+        builder.save(get_po_file_path(language))
+
+    def write_to_po_file(self, builder, trans):
+        comment = get_reference(trans.model, trans.field_name, trans.object_id)
+
+        # If the msgid already exists, add the comment to it; otherwise, add a new entry.
+        builder.add(trans.source_value, trans.field_value, comment)
+
+    def merge_changes(self, builders, since):
+        """
+        Point the references of the objects changed since ``since`` to their current source texts, and remove
+        those of the fields left empty and of the deleted objects.
+        """
+        languages = list(builders)
+        for model in get_translatable_models():
+            object_ids = get_changed_objects(model, languages, since)
+            if not object_ids:
+                continue
+            written = set()
+            for trans in get_storage(model).fetch(model, languages, object_ids=object_ids):
+                reference = get_reference(model, trans.field_name, trans.object_id)
+                builders[trans.language].move(trans.source_value, trans.field_value, reference)
+                written.add((trans.language, reference))
+            for object_id in object_ids:
+                for field_name in model.translatable_fields:
+                    reference = get_reference(model, field_name, object_id)
+                    for language, builder in builders.items():
+                        if (language, reference) not in written:
+                            builder.remove(reference)
 
     def handle(self, *args, **options):
-        threads = []
-
-        for language_set in settings.LANGUAGES:
-            t = threading.Thread(target=self.generate_po_for_language, args=(language_set,))
-            t.start()
-            threads.append(t)
-
-        for t in threads:
-            t.join()
+        languages = [lang_code for lang_code, lang_name in settings.LANGUAGES]
+        if options['incremental'] and not changes.is_enabled():
+            raise CommandError('--incremental requires DRT_TRACK_CHANGES = True')
+        # Taken before reading anything, so what changes during the export is exported again next time.
+        self.watermark = timezone.now() if changes.is_enabled() else None
+
+        with ThreadPoolExecutor(max_workers=len(languages)) as executor:
+            builders = dict(zip(languages, executor.map(self.load_po_builder, languages)))
+
+            watermarks = {
+                language: get_watermark(builder.po) for language, builder in builders.items()
+            } if options['incremental'] else {}
+            full_languages = [language for language in languages if watermarks.get(language) is None]
+            if full_languages:
+                # A single pass over the objects and their translations feeds the files of every language, only
+                # the parsing and writing of the files run in parallel.
+                for trans in fetch_translatable_fields(full_languages):
+                    self.write_to_po_file(builders[trans.language], trans)
+            incremental_builders = {
+                language: builder for language, builder in builders.items() if language not in full_languages
+            }
+            if incremental_builders:
+                # Files exported at different times are merged from the oldest watermark, merging is idempotent so
+                # the changes of the margin before it can be merged again.
+                since = min(watermarks[language] for language in incremental_builders) - changes.get_watermark_margin()
+                self.merge_changes(incremental_builders, since)
+
+            list(executor.map(self.save_po_builder, builders.keys(), builders.values()))
@@ -0,0 +1,90 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from django_restful_translator.storage import generic_storage, get_storage
+from django_restful_translator.utils import get_translatable_models
+
+
+class Command(BaseCommand):
+    help = 'Move translations between the generic Translation table and the storage configured on each model'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help='Models to migrate as app_label.ModelName (all models with a storage of their own by default)'
+        )
+        parser.add_argument(
+            '--to_generic',
+            action='store_true',
+            help='Move translations from the model storage back to the generic Translation table'
+        )
+        parser.add_argument(
+            '--delete_source',
+            action='store_true',
+            help='Delete the translations from the storage they were moved from'
+        )
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=1000,
+            help='Number of objects migrated at once'
+        )
+
+    def get_models(self, labels):
+        if not labels:
+            return [model for model in get_translatable_models() if get_storage(model) is not generic_storage]
+        translatable_models = get_translatable_models()
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError) as e:
+                raise CommandError(f'Unknown model: {label}') from e
+            if model not in translatable_models:
+                raise CommandError(f'{label} is not a translatable model')
+            if get_storage(model) is generic_storage:
+                raise CommandError(f'{label} uses the generic Translation table already')
+            models.append(model)
+        return models
+
+    def migrate_chunk(self, model, objects, source, target, delete_source):
+        languages = [lang_code for lang_code, lang_name in settings.LANGUAGES]
+        source.attach(objects, languages)
+        items = []
+        for obj in objects:
+            values = {}
+            for field_name in model.translatable_fields:
+                for language, value in source.get_index(obj, languages, field_name).get(field_name, {}).items():
+                    values[(field_name, language)] = value
+            items.append((obj, values))
+        with transaction.atomic():
+            written = target.save(items)
+            if delete_source:
+                source.delete(model, [obj.pk for obj in objects])
+        return written
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        for model in self.get_models(options['models']):
+            source, target = generic_storage, get_storage(model)
+            if options['to_generic']:
+                source, target = target, source
+
+            count = written = 0
+            last_pk = None
+            while True:
+                # Keyset pagination keeps every chunk query cheap on large tables.
+                queryset = model._default_manager.order_by('pk')
+                if last_pk is not None:
+                    queryset = queryset.filter(pk__gt=last_pk)
+                objects = list(queryset[:chunk_size])
+                if not objects:
+                    break
+                written += self.migrate_chunk(model, objects, source, target, options['delete_source'])
+                count += len(objects)
+                last_pk = objects[-1].pk
+            self.stdout.write(self.style.SUCCESS(
+                f'Migrated {written} translations of {count} {model._meta.model_name} objects'))
@@ -1,13 +1,45 @@
+import asyncio
+import heapq
 import html
+import itertools
+import threading
+import time
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
-from django_restful_translator.translation_providers import TranslationProvider
-from django_restful_translator.utils import fetch_translatable_fields, replace_placeholders_with_tokens, \
-    replace_tokens_with_placeholders, get_batches
+from django_restful_translator import jobs as translation_jobs
+from django_restful_translator import memory as translation_memory
+from django_restful_translator.batching import BatchLimits, iter_requests, join_texts, pack_batches, split_texts
+from django_restful_translator.models import TranslationJob, TranslationJobItem, TranslationMemory
+from django_restful_translator.placeholders import SpanProtector
+from django_restful_translator.rate_limit import ProviderScheduler
+from django_restful_translator.translation_providers import AsyncTranslationProvider, TranslationProvider
+from django_restful_translator.utils import TranslationWriter, fetch_missing_translations, fetch_stale_translations, \
+    fetch_translatable_fields, get_batches
+
+
+@contextmanager
+def event_loop_thread(concurrency):
+    """
+    Run an event loop in a thread of its own, so coroutines can be submitted while this thread keeps using the
+    ORM, which isn't allowed from async code. Thread-offloaded providers get ``concurrency`` threads.
+    """
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    loop.set_default_executor(executor)
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield loop
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        executor.shutdown()
 
 
 class Command(BaseCommand):
@@ -18,12 +50,14 @@ class Command(BaseCommand):
         parser.add_argument(
             '--language',
             type=str,
-            help='Specify the language to which the fields should be translated'
+            help='Specify the language to which the fields should be translated, a comma separated list of languages '
+                 'or "all" for every language but the default one'
         )
         parser.add_argument(
             '--target_language',
             type=str,
-            help='Specify the provider target language if it differs from the setting language',
+            help='Specify the provider target language if it differs from the setting language, or a comma separated '
+                 'list of language=target_language pairs when translating to several languages',
             default=None
         )
         parser.add_argument(
@@ -37,6 +71,19 @@ class Command(BaseCommand):
             action='store_true',
             help='Translate even existing translations'
         )
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Translate the translations made from a source text that changed since, along with missing ones'
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            default=None,
+            metavar='JOB_ID',
+            help='Resume an interrupted run: send again the pending and failed batches of the job, then the rest of '
+                 'its translations. The languages, provider and mode of the job are used'
+        )
         parser.add_argument(
             '--workers',
             type=int,
@@ -48,58 +95,199 @@ class Command(BaseCommand):
             action='store_true',
             help='One request per one unit of text'
         )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='use_async',
+            help='Send the provider requests from an event loop instead of worker threads'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=100,
+            help='Number of provider requests in flight with --async'
+        )
+        parser.add_argument(
+            '--requests_per_second',
+            type=float,
+            default=None,
+            help='Maximum provider requests per second (the provider default, unlimited if it has none)'
+        )
+        parser.add_argument(
+            '--characters_per_second',
+            type=float,
+            default=None,
+            help='Maximum characters sent to the provider per second (the provider default, unlimited if it has none)'
+        )
+        parser.add_argument(
+            '--max_retries',
+            type=int,
+            default=5,
+            help='Number of times a batch is sent again after a throttling or transient provider error'
+        )
+        parser.add_argument(
+            '--save_batch_size',
+            type=int,
+            default=500,
+            help='Number of translations saved to the database at once'
+        )
+        parser.add_argument(
+            '--without_memory',
+            action='store_true',
+            help='Ask the provider even for texts it already translated in earlier runs'
+        )
+        parser.add_argument(
+            '--progress_interval',
+            type=float,
+            default=10,
+            help='Seconds between progress reports'
+        )
 
-    def translate_item(self, translation, provider, target_language):
-        text = getattr(translation.content_object, translation.field_name)
-        text_with_tokens, tokens = replace_placeholders_with_tokens(text)
-        translated_text = provider.translate_text(text_with_tokens, settings.LANGUAGE_CODE, target_language)
-        translated_text = replace_tokens_with_placeholders(translated_text, tokens)
-        decoded_text = html.unescape(translated_text)
-        translation.field_value = decoded_text
-        translation.save()
+    def prepare_texts(self, translations):
+        """Source texts with their placeholders and markup protected, and the spans to restore them."""
+        texts, spans_list = [], []
+        for translation in translations:
+            text, spans = self.span_protector.protect(translation.source_value)
+            texts.append(text)
+            spans_list.append(spans)
+        return texts, spans_list
 
-        self.stdout.write(
-            f'Translated {translation.content_object._meta.model_name} field {translation.field_name} to {target_language}')
+    def apply_texts(self, translations, spans_list, translated_texts):
+        for translation, spans, translated_text in zip(translations, spans_list, translated_texts):
+            # Unescaped first, so the restored spans are kept exactly as in the source text.
+            translation.field_value = self.span_protector.restore(html.unescape(translated_text), spans)
+        return translations
 
-    def translate_batch(self, translations, provider, target_language):
-        content_to_translate = []
-        original_translations = []
-        tokens_list = []
-        for translation in translations:
-            original_text = getattr(translation.content_object, translation.field_name)
-            text_with_tokens, tokens = replace_placeholders_with_tokens(original_text)
-            content_to_translate.append(text_with_tokens)
-            tokens_list.append(tokens)
-            original_translations.append(translation)
-
-        translated_texts = provider.translate_text(content_to_translate, settings.LANGUAGE_CODE,
-                                                   target_language)
-
-        for translation, tokens, translated_text in zip(original_translations, tokens_list, translated_texts):
-            translated_text_with_placeholders = replace_tokens_with_placeholders(translated_text, tokens)
-            translation.field_value = html.unescape(translated_text_with_placeholders)
-            translation.save()
-            self.stdout.write(
-                f'Translated {translation.content_object._meta.model_name} field {translation.field_name} to {target_language}')
+    def translate_batch(self, translations, provider):
+        target_language = self.target_languages[translations[0].language]
+        texts, spans_list = self.prepare_texts(translations)
+        pieces, layout = split_texts(texts, self.limits, self.span_protector.token_pattern)
+        translated_pieces = []
+        for request in iter_requests(pieces, self.limits):
+            time.sleep(self.scheduler.reserve(sum(len(piece) for piece in request)))
+            if self.limits.max_items == 1:
+                translated_pieces.append(provider.translate_text(request[0], settings.LANGUAGE_CODE, target_language))
+            else:
+                translated_pieces.extend(provider.translate_text(request, settings.LANGUAGE_CODE, target_language))
+        return self.apply_texts(translations, spans_list, join_texts(translated_pieces, layout))
 
-    def handle(self, *args, **options):
-        language = options['language']
-        target_language = options['target_language']
-        provider_name = options['provider']
-        translate_all = options['all']
-        workers = options['workers']
-        without_batch = options['without_batch']
+    async def translate_batch_async(self, translations, provider):
+        target_language = self.target_languages[translations[0].language]
+        texts, spans_list = self.prepare_texts(translations)
+        pieces, layout = split_texts(texts, self.limits, self.span_protector.token_pattern)
+        translated_pieces = []
+        for request in iter_requests(pieces, self.limits):
+            await asyncio.sleep(self.scheduler.reserve(sum(len(piece) for piece in request)))
+            if self.limits.max_items == 1:
+                translated_pieces.append(
+                    await provider.translate_text_async(request[0], settings.LANGUAGE_CODE, target_language))
+            else:
+                translated_pieces.extend(
+                    await provider.translate_text_async(request, settings.LANGUAGE_CODE, target_language))
+        return self.apply_texts(translations, spans_list, join_texts(translated_pieces, layout))
 
-        if not target_language:
-            target_language = language
+    def get_languages(self, value):
+        """The languages of ``--language``, or None after reporting an invalid one."""
+        available_languages = [lang[0] for lang in settings.LANGUAGES]
+        if value == 'all':
+            return [language for language in available_languages if language != settings.LANGUAGE_CODE]
+        languages = [language.strip() for language in (value or '').split(',') if language.strip()] or [value]
+        for language in languages:
+            if language not in available_languages:
+                self.stdout.write(f'Unknown language: {language}')
+                return None
+            if language == settings.LANGUAGE_CODE:
+                self.stdout.write('Cannot translate to the same language')
+                return None
+        return languages
 
-        if language not in [lang[0] for lang in settings.LANGUAGES]:
-            self.stdout.write(f'Unknown language: {language}')
-            return
+    def get_target_languages(self, languages, value):
+        """Map each language to its provider target language, or return None after reporting an invalid value."""
+        target_languages = {language: language for language in languages}
+        if not value:
+            return target_languages
+        if '=' not in value:
+            if len(languages) > 1:
+                self.stdout.write('Use language=target_language pairs to set target languages of several languages')
+                return None
+            return {languages[0]: value}
+        for pair in value.split(','):
+            language, __, target_language = pair.partition('=')
+            language, target_language = language.strip(), target_language.strip()
+            if language not in target_languages or not target_language:
+                self.stdout.write(f'Invalid target language: {pair}')
+                return None
+            target_languages[language] = target_language
+        return target_languages
+
+    def get_job(self, options):
+        """The job to run, created from the options or loaded for ``--resume``. None after reporting an error."""
+        if options['resume']:
+            job = TranslationJob.objects.filter(pk=options['resume']).first()
+            if job is None:
+                self.stdout.write(f'Unknown translation job: {options["resume"]}')
+            return job
+
+        languages = self.get_languages(options['language'])
+        if not languages:
+            return None
+        target_languages = self.get_target_languages(languages, options['target_language'])
+        if target_languages is None:
+            return None
+        if options['all']:
+            mode = TranslationJob.MODE_ALL
+        elif options['stale']:
+            mode = TranslationJob.MODE_STALE
+        else:
+            mode = TranslationJob.MODE_MISSING
+        return TranslationJob(provider=options['provider'], target_languages=target_languages, mode=mode,
+                              without_batch=options['without_batch'])
+
+    def fetch_translations(self, job):
+        """
+        The records ``job`` translates, without those already in one of its items. Resumed jobs read them again,
+        as records filled from the memory or waiting for an identical text sent in another batch have no item, and
+        may not have been saved when the job stopped.
+        """
+        languages = list(job.target_languages)
+        if job.mode == TranslationJob.MODE_ALL:
+            translations = fetch_translatable_fields(languages)
+        elif job.mode == TranslationJob.MODE_STALE:
+            translations = itertools.chain(fetch_missing_translations(languages), fetch_stale_translations(languages))
+        else:
+            translations = fetch_missing_translations(languages)
+        if job.pk is None:
+            return translations
+        planned_keys = translation_jobs.get_planned_keys(job)
+        return (
+            translation for translation in translations
+            if translation_jobs.get_record_key(translation) not in planned_keys
+        )
 
-        if language == settings.LANGUAGE_CODE:
-            self.stdout.write('Cannot translate to the same language')
+    def resume_tasks(self, job, provider):
+        """The ``(batch, item)`` tasks of the unfinished items of ``job``."""
+        tasks = []
+        for item in translation_jobs.get_unfinished_items(job):
+            batch = translation_jobs.load_records(item.records)
+            for translation in batch:
+                self.waiting[self.get_memory_key(translation, provider)] = [translation]
+            tasks.append((batch, item))
+        return tasks
+
+    def plan_tasks(self, job, resumed, batches):
+        """Yield the ``(batch, item)`` tasks to run, recording an item for every new batch."""
+        yield from resumed
+        for batch in batches:
+            yield batch, translation_jobs.add_item(job, batch)
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+
+        job = self.get_job(options)
+        if job is None:
             return
+        provider_name = job.provider
+        self.target_languages = job.target_languages
 
         available_providers = {cls.name: cls for cls in TranslationProvider.__subclasses__()}
         provider_class = available_providers.get(provider_name)
@@ -107,38 +295,172 @@ class Command(BaseCommand):
             self.stdout.write(f'Unknown provider: {provider_name}')
             return
 
+        if options['use_async'] and not issubclass(provider_class, AsyncTranslationProvider):
+            self.stdout.write(f'Provider {provider_name} does not support --async')
+            return
+
+        # One provider client, scheduler and pool of workers are shared by all the languages, whose records are
+        # read in a single pass over the source objects.
         provider = provider_class()
-        translations_qs = fetch_translatable_fields(language)
-        for_translation_list = []
-        if translate_all is False:
-            for translation in translations_qs:
-                if len(translation.field_value) > 0:
-                    continue
-                for_translation_list.append(translation)
+        self.span_protector = SpanProtector(provider.span_markup)
+        translations = self.fetch_translations(job)
+        if job.pk is None:
+            job.save()
+            self.stdout.write(f'Started translation job {job.pk}')
         else:
-            for_translation_list = translations_qs
+            self.stdout.write(f'Resuming translation job {job.pk}')
 
-        if without_batch or provider.batch_size == 1:
-            with ThreadPoolExecutor(max_workers=workers) as executor:
-                futures = [
-                    executor.submit(self.translate_item, trans, provider, target_language)
-                    for trans in for_translation_list
-                ]
-
-                for future in as_completed(futures):
-                    try:
-                        future.result()
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Error occurred: {e}"))
+        writer = TranslationWriter(batch_size=options['save_batch_size'])
+        self.translated = self.reused = self.failed = self.retried = 0
+        self.progress_interval = options['progress_interval']
+        self.last_report = time.monotonic()
+        self.waiting = {}
+        self.known = {}
+        self.retry_order = itertools.count()
+        resumed = self.resume_tasks(job, provider)
+        translations = self.deduplicate(translations, writer, provider, use_memory=not options['without_memory'])
+
+        self.scheduler = ProviderScheduler(
+            options['concurrency'] if options['use_async'] else workers * 2,
+            requests_per_second=options['requests_per_second'] or provider.requests_per_second,
+            characters_per_second=options['characters_per_second'] or provider.characters_per_second,
+            max_retries=options['max_retries']
+        )
+
+        # Batches are filled up to the item, character and byte limits of the provider, texts over them are split.
+        # A batch holds a single language, the batches of all the languages are interleaved.
+        self.limits = BatchLimits.for_provider(provider, single=job.without_batch or provider.batch_size == 1)
+        batches = pack_batches(
+            translations, self.limits, key=lambda translation: self.prepare_texts([translation])[0][0],
+            group=lambda translation: translation.language
+        )
+        # Every batch is recorded as an item of the job before it is sent, finished items are saved by the writer.
+        tasks = self.plan_tasks(job, resumed, batches)
+
+        if options['use_async']:
+            with event_loop_thread(options['concurrency']) as loop:
+                def submit(batch):
+                    return asyncio.run_coroutine_threadsafe(self.translate_batch_async(batch, provider), loop)
+
+                self.run_tasks(tasks, submit, writer, provider)
         else:
             with ThreadPoolExecutor(max_workers=workers) as executor:
-                futures = [
-                    executor.submit(self.translate_batch, batch, provider, target_language)
-                    for batch in get_batches(for_translation_list, provider.batch_size)
-                ]
-
-                for future in as_completed(futures):
-                    try:
-                        future.result()
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Error occurred: {e}"))
+                def submit(batch):
+                    return executor.submit(self.translate_batch, batch, provider)
+
+                # At most a few tasks per worker are in flight.
+                self.run_tasks(tasks, submit, writer, provider)
+        writer.flush()
+        job.status = TranslationJob.STATUS_COMPLETED
+        job.save(update_fields=['status', 'updated_at'])
+        self.report_progress(writer)
+
+    def run_tasks(self, tasks, submit, writer, provider):
+        """
+        Submit the batches while streaming the translations, with at most ``scheduler.concurrency`` pending.
+        Batches failing with a transient error are queued again and submitted once their backoff has passed.
+        """
+        futures = {}
+        self.retry_queue = []
+        tasks = iter(tasks)
+        exhausted = False
+        while True:
+            if len(futures) < self.scheduler.concurrency:
+                if self.retry_queue and self.retry_queue[0][0] <= time.monotonic():
+                    due_at, order, batch, attempt, item = heapq.heappop(self.retry_queue)
+                    futures[submit(batch)] = (batch, attempt, item)
+                    continue
+                task = None if exhausted else next(tasks, None)
+                if task is not None:
+                    batch, item = task
+                    futures[submit(batch)] = (batch, 0, item)
+                    continue
+                exhausted = True
+            if not futures and not self.retry_queue:
+                break
+            # A due retry only shortens the wait when a slot is free to submit it, otherwise it would spin.
+            timeout = None
+            if self.retry_queue and len(futures) < self.scheduler.concurrency:
+                timeout = max(0.0, self.retry_queue[0][0] - time.monotonic())
+            if futures:
+                done, not_done = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                self.collect_results(done, futures, writer, provider)
+            else:
+                time.sleep(timeout)
+
+    def get_memory_key(self, translation, provider):
+        return translation_memory.make_key(translation.source_value, settings.LANGUAGE_CODE,
+                                           self.target_languages[translation.language], provider.name)
+
+    def deduplicate(self, translations, writer, provider, use_memory=True):
+        """
+        Yield the translations the provider has to translate. The others are filled from the translation memory
+        or wait for the result of an identical source text of this run.
+        """
+        for chunk in get_batches(translations, writer.batch_size):
+            keys = [self.get_memory_key(translation, provider) for translation in chunk]
+            if use_memory:
+                self.known.update(translation_memory.get_many(set(keys) - self.known.keys() - self.waiting.keys()))
+            for translation, key in zip(chunk, keys):
+                if key in self.known:
+                    translation.field_value = self.known[key]
+                    self.reused += 1
+                    writer.add([translation])
+                elif key in self.waiting:
+                    self.waiting[key].append(translation)
+                else:
+                    self.waiting[key] = [translation]
+                    yield translation
+
+    def collect_results(self, done, futures, writer, provider):
+        """Hand the translations of finished tasks to the writer, workers only call the provider."""
+        for future in done:
+            sent, attempt, item = futures.pop(future)
+            try:
+                translations = future.result()
+            except Exception as e:
+                if provider.is_throttled(e):
+                    self.scheduler.record_throttle()
+                if provider.is_transient(e) and attempt < self.scheduler.max_retries:
+                    self.retried += 1
+                    due_at = time.monotonic() + self.scheduler.get_backoff(attempt)
+                    heapq.heappush(self.retry_queue, (due_at, next(self.retry_order), sent, attempt + 1, item))
+                    continue
+                for translation in sent:
+                    self.failed += len(self.waiting.pop(self.get_memory_key(translation, provider)))
+                item.status = TranslationJobItem.STATUS_FAILED
+                item.error = str(e)
+                writer.add_job_items([item])
+                self.stdout.write(self.style.ERROR(f"Error occurred: {e}"))
+                continue
+            self.scheduler.record_success()
+            memory_entries = []
+            for translation in translations:
+                key = self.get_memory_key(translation, provider)
+                duplicates = self.waiting.pop(key)
+                for duplicate in duplicates:
+                    duplicate.field_value = translation.field_value
+                self.known[key] = translation.field_value
+                self.translated += 1
+                self.reused += len(duplicates) - 1
+                writer.add(duplicates)
+                memory_entries.append(TranslationMemory(
+                    key=key,
+                    provider=provider.name,
+                    source_language=settings.LANGUAGE_CODE,
+                    target_language=self.target_languages[translation.language],
+                    source_text=translation.source_value,
+                    translated_text=translation.field_value
+                ))
+            writer.add_memory(memory_entries)
+            item.status = TranslationJobItem.STATUS_DONE
+            item.results = [translation.field_value for translation in translations]
+            item.error = ''
+            writer.add_job_items([item])
+        if time.monotonic() - self.last_report >= self.progress_interval:
+            self.report_progress(writer)
+
+    def report_progress(self, writer):
+        self.last_report = time.monotonic()
+        self.stdout.write(f'Translated {self.translated} fields, reused {self.reused}, saved {writer.saved}, '
+                          f'failed {self.failed}, retried {self.retried} batches')
@@ -1,13 +1,13 @@
 import os
 import threading
+from collections import defaultdict
 
 import polib
-from django.apps import apps
 from django.conf import settings
-from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import BaseCommand
 
-from django_restful_translator.models import TranslatableModel, Translation
+from django_restful_translator.storage import FETCH_CHUNK_SIZE, get_storage, iter_chunks
+from django_restful_translator.utils import get_translatable_models, save_translations
 
 
 class Command(BaseCommand):
@@ -23,29 +23,27 @@ class Command(BaseCommand):
         # Open the .po file for this language
         po_file_path = os.path.join(settings.BASE_DIR, 'drt_locale', language, 'LC_MESSAGES', 'django.po')
 
+        translatable_models = get_translatable_models()
+
         # Check the last modification time of the .po file
         if os.path.isfile(po_file_path):
             po_file_mod_time = os.path.getmtime(po_file_path)
-            try:
-                # Get the last update time of the Translation objects for the current language
-                last_translation_update = Translation.objects.filter(language=language).latest(
-                    'updated_at').updated_at.timestamp()
-                # Only proceed if the .po file is newer than the last update in the database
-                if po_file_mod_time <= last_translation_update:
-                    print(f"Skipping {language} because the .po file is older than the last update in the database")
-                    return
-            except Translation.DoesNotExist:
-                pass
+            # Get the last update time of the translations for the current language
+            storages = {get_storage(model): model for model in translatable_models}
+            last_updates = [storage.last_updated(model, language) for storage, model in storages.items()]
+            last_updates = [last_update for last_update in last_updates if last_update is not None]
+            # Only proceed if the .po file is newer than the last update in the database
+            if last_updates and po_file_mod_time <= max(last_updates).timestamp():
+                print(f"Skipping {language} because the .po file is older than the last update in the database")
+                return
 
         if not os.path.isfile(po_file_path):
             return
 
         po = polib.pofile(po_file_path)
 
-        models = apps.get_models()
-        translatable_models = [model for model in models if issubclass(model, TranslatableModel)]
-
-        # Iterate over each entry in the .po file
+        # Collect the values of each object from the .po file
+        values_by_object = defaultdict(dict)
         for entry in po:
             for comment in entry.tcomment.splitlines():
                 model_name, field_name, object_id = comment.split("__")
@@ -55,18 +53,30 @@ class Command(BaseCommand):
                 field_value = entry.msgstr
                 if field_value == "":
                     continue
-                # Fetch or create the Translation object
-                trans, created = Translation.objects.update_or_create(
-                    content_type=ContentType.objects.get_for_model(model),
-                    object_id=object_id,
-                    field_name=field_name,
-                    language=language,
-                    defaults={"field_value": field_value}
-                )
-                # If the Translation object already existed, update it
-                if not created:
-                    trans.field_value = entry.msgstr
-                    trans.save()
+                values_by_object[(model, object_id)][(field_name, language)] = field_value
+
+        # Skip the objects deleted since the file was written, translation tables have a foreign key to them
+        existing = self.get_existing_objects(values_by_object.keys())
+
+        # Write them through the storage of each model, objects only need their primary key for that
+        save_translations([
+            (model(pk=object_id), values) for (model, object_id), values in values_by_object.items()
+            if (model, object_id) in existing
+        ])
+
+    def get_existing_objects(self, keys):
+        """The ``(model, object_id)`` pairs of ``keys`` whose object is in the database."""
+        object_ids_by_model = defaultdict(set)
+        for model, object_id in keys:
+            object_ids_by_model[model].add(object_id)
+        existing = set()
+        for model, object_ids in object_ids_by_model.items():
+            for chunk in iter_chunks(object_ids, FETCH_CHUNK_SIZE):
+                pks = model._default_manager.filter(
+                    pk__in=[model._meta.pk.to_python(object_id) for object_id in chunk]
+                ).values_list('pk', flat=True)
+                existing.update((model, str(pk)) for pk in pks)
+        return existing
 
     def handle(self, *args, **options):
         threads = []
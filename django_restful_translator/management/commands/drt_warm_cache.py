@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from django_restful_translator import cache as translation_cache
+from django_restful_translator.models import Translation, object_id_filter
+from django_restful_translator.storage import GenericTranslationStorage, get_storage
+from django_restful_translator.utils import get_translatable_models
+
+
+class Command(BaseCommand):
+    help = 'Load DB translations into the translation cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--language',
+            type=str,
+            help='Warm only this language (all languages by default)',
+            default=None
+        )
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            default=500,
+            help='Number of objects loaded and cached at once'
+        )
+
+    def warm_chunk(self, model, content_type_id, object_ids, languages):
+        values_by_object = {(object_id, language): {} for object_id in object_ids for language in languages}
+        translations = Translation.objects.filter(
+            object_id_filter(model, object_ids),
+            content_type_id=content_type_id,
+            language__in=languages
+        ).values_list('object_id', 'language', 'field_name', 'field_value')
+        for object_id, language, field_name, field_value in translations:
+            values_by_object[(object_id, language)][field_name] = field_value
+        translation_cache.set_many(content_type_id, values_by_object)
+
+    def handle(self, *args, **options):
+        if not translation_cache.is_enabled():
+            self.stdout.write(self.style.WARNING('The translation cache is disabled, set DRT_CACHE_ALIAS to enable it'))
+            return
+
+        language = options['language']
+        chunk_size = options['chunk_size']
+        languages = [language] if language else [lang_code for lang_code, lang_name in settings.LANGUAGES]
+
+        # Other storages keep translations on the objects and don't go through the cache.
+        translatable_models = [
+            model for model in get_translatable_models() if isinstance(get_storage(model), GenericTranslationStorage)
+        ]
+        for model in translatable_models:
+            content_type_id = ContentType.objects.get_for_model(model).pk
+            count = 0
+            chunk = []
+            for pk in model.objects.values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+                chunk.append(str(pk))
+                if len(chunk) >= chunk_size:
+                    self.warm_chunk(model, content_type_id, chunk, languages)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                self.warm_chunk(model, content_type_id, chunk, languages)
+                count += len(chunk)
+            self.stdout.write(f'Cached translations of {count} {model._meta.model_name} objects')
@@ -0,0 +1,25 @@
+import hashlib
+
+from django_restful_translator.models import TranslationMemory
+
+
+def make_key(source_text, source_language, target_language, provider):
+    """Hash identifying a source text translated between two languages by a provider."""
+    value = '\0'.join((provider, source_language, target_language, source_text))
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def get_many(keys, batch_size=500):
+    """Return the stored translations as ``{key: translated_text}``, missing keys are simply absent."""
+    keys = list(keys)
+    found = {}
+    for i in range(0, len(keys), batch_size):
+        found.update(
+            TranslationMemory.objects.filter(key__in=keys[i:i + batch_size]).values_list('key', 'translated_text')
+        )
+    return found
+
+
+def set_many(entries, batch_size=500):
+    """Store ``TranslationMemory`` objects, keeping the existing entry when a key is already stored."""
+    TranslationMemory.objects.bulk_create(entries, batch_size=batch_size, ignore_conflicts=True)
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('django_restful_translator', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translation',
+            name='object_int_id',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='translation',
+            name='object_uuid',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='translation',
+            index=models.Index(fields=['content_type', 'language', 'object_id'], name='drt_trans_ct_lang_obj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='translation',
+            index=models.Index(fields=['content_type', 'language', 'object_int_id'], name='drt_trans_ct_lang_int_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='translation',
+            index=models.Index(fields=['content_type', 'language', 'object_uuid'], name='drt_trans_ct_lang_uuid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='translation',
+            index=models.Index(fields=['language', 'updated_at'], name='drt_trans_lang_updated_idx'),
+        ),
+    ]
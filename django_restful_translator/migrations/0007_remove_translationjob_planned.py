@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_restful_translator', '0006_translatable_object_change'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='translationjob',
+            name='planned',
+        ),
+    ]
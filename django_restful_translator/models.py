@@ -1,29 +1,311 @@
+import operator
+import uuid
+from functools import reduce
+
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.db import models
+from django.db.models import Q
+from django.utils.translation import get_language
+
+PREFETCHED_TRANSLATIONS_ATTR = '_drt_prefetched_translations'
+PREFETCH_SCOPE_ATTR = '_drt_prefetch_scope'
+TRANSLATION_INDEX_ATTR = '_drt_translation_index'
+BIGINT_LIMIT = 2 ** 63
+
+
+def get_typed_object_key_field(model):
+    """
+    Name of the ``Translation`` column holding a typed copy of ``model``'s primary key, None when the key is
+    neither an integer nor a UUID.
+    """
+    pk = model._meta.pk
+    while pk.is_relation:
+        pk = pk.target_field
+    if isinstance(pk, models.IntegerField):
+        return 'object_int_id'
+    if isinstance(pk, models.UUIDField):
+        return 'object_uuid'
+    return None
+
+
+def use_typed_object_key():
+    return getattr(settings, 'DRT_TYPED_OBJECT_KEY', False)
+
+
+def object_id_filter(model, object_ids):
+    """
+    ``Q`` matching the translations of ``model`` objects by primary key, on the typed key column when
+    ``DRT_TYPED_OBJECT_KEY`` is enabled and the key type allows it.
+    """
+    key_field = get_typed_object_key_field(model) if use_typed_object_key() else None
+    if key_field == 'object_int_id':
+        return models.Q(object_int_id__in=[int(str(object_id)) for object_id in object_ids])
+    if key_field == 'object_uuid':
+        return models.Q(object_uuid__in=[uuid.UUID(str(object_id)) for object_id in object_ids])
+    return models.Q(object_id__in=[str(object_id) for object_id in object_ids])
 
 
 class Translation(models.Model):
     content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE)
     object_id = models.CharField(max_length=255)
+    object_int_id = models.BigIntegerField(null=True, blank=True, editable=False)
+    object_uuid = models.UUIDField(null=True, blank=True, editable=False)
     content_object = GenericForeignKey('content_type', 'object_id')
     language = models.CharField(max_length=10, choices=settings.LANGUAGES)
     field_name = models.CharField(max_length=255)
     field_value = models.TextField()
+    # SHA-256 of the source text the value was translated from, empty when unknown.
+    source_hash = models.CharField(max_length=64, blank=True, default='')
     created_at = models.DateTimeField(blank=True, auto_now_add=True)
     updated_at = models.DateTimeField(blank=True, auto_now=True)
 
     class Meta:
         unique_together = ('content_type', 'object_id', 'language', 'field_name',)
         ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=['content_type', 'language', 'object_id'], name='drt_trans_ct_lang_obj_idx'),
+            models.Index(fields=['content_type', 'language', 'object_int_id'], name='drt_trans_ct_lang_int_idx'),
+            models.Index(fields=['content_type', 'language', 'object_uuid'], name='drt_trans_ct_lang_uuid_idx'),
+            models.Index(fields=['language', 'updated_at'], name='drt_trans_lang_updated_idx'),
+        ]
 
     def __str__(self):
         return f'{self.content_type}__{self.field_name}__{self.object_id}'
 
+    def save(self, *args, **kwargs):
+        self.set_typed_object_key()
+        super().save(*args, **kwargs)
+
+    def set_typed_object_key(self):
+        """Copy ``object_id`` into the typed key column matching its format."""
+        object_id = str(self.object_id)
+        self.object_int_id = None
+        self.object_uuid = None
+        if object_id.lstrip('-').isdigit():
+            if -BIGINT_LIMIT <= int(object_id) < BIGINT_LIMIT:
+                self.object_int_id = int(object_id)
+        else:
+            try:
+                self.object_uuid = uuid.UUID(object_id)
+            except ValueError:
+                pass
+
+
+class TranslationMemory(models.Model):
+    """Provider translation of a source text, reused instead of asking the provider again."""
+    key = models.CharField(max_length=64, unique=True)
+    provider = models.CharField(max_length=50)
+    source_language = models.CharField(max_length=10)
+    target_language = models.CharField(max_length=20)
+    source_text = models.TextField()
+    translated_text = models.TextField()
+    created_at = models.DateTimeField(blank=True, auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.provider}__{self.source_language}__{self.target_language}__{self.key}'
+
+
+class TranslationJob(models.Model):
+    """A run of ``drt_translate_models``, with what it translates so it can be resumed after a crash."""
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_CHOICES = (
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+    )
+    MODE_MISSING = 'missing'
+    MODE_STALE = 'stale'
+    MODE_ALL = 'all'
+    MODE_CHOICES = (
+        (MODE_MISSING, 'Missing translations'),
+        (MODE_STALE, 'Missing and stale translations'),
+        (MODE_ALL, 'All translations'),
+    )
+
+    provider = models.CharField(max_length=50)
+    # {language: provider target language}
+    target_languages = models.JSONField(default=dict)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default=MODE_MISSING)
+    without_batch = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    created_at = models.DateTimeField(blank=True, auto_now_add=True)
+    updated_at = models.DateTimeField(blank=True, auto_now=True)
+
+    def __str__(self):
+        return f'{self.pk}__{self.provider}__{self.status}'
+
+
+class TranslationJobItem(models.Model):
+    """A batch of a ``TranslationJob`` sent to the provider, with the translated values once it is done."""
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    job = models.ForeignKey(TranslationJob, on_delete=models.CASCADE, related_name='items')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # [[model label, object id, field name, language, source text], ...]
+    records = models.JSONField(default=list)
+    results = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(blank=True, auto_now_add=True)
+    updated_at = models.DateTimeField(blank=True, auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['job', 'status'], name='drt_job_item_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.job_id}__{self.pk}__{self.status}'
+
+
+class TranslatableObjectChange(models.Model):
+    """
+    When a translatable object was last saved or deleted, recorded with ``DRT_TRACK_CHANGES`` so
+    ``drt_makemessages --incremental`` reads only the objects changed since its previous export.
+    """
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=255)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('content_type', 'object_id',)
+        indexes = [
+            models.Index(fields=['content_type', 'changed_at'], name='drt_change_ct_changed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.content_type}__{self.object_id}__{"deleted" if self.deleted else "saved"}'
+
+
+class ModelTranslation(models.Model):
+    """
+    Base of the translation models generated by ``TableTranslationStorage``, one per translatable model with a
+    real foreign key (``master``) to the translated object.
+    """
+    language = models.CharField(max_length=10, choices=settings.LANGUAGES)
+    field_name = models.CharField(max_length=64)
+    field_value = models.TextField()
+    # SHA-256 of the source text the value was translated from, empty when unknown.
+    source_hash = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(blank=True, auto_now_add=True)
+    updated_at = models.DateTimeField(blank=True, auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f'{self.master_id}__{self.field_name}__{self.language}'
+
+    @property
+    def content_object(self):
+        return self.master
+
+    @property
+    def object_id(self):
+        return str(self.master_id)
+
+
+class TranslationPrefetch(models.Prefetch):
+    """
+    Prefetch of the ``translations`` relation limited to some languages and fields.
+
+    The rows are stored in ``PREFETCHED_TRANSLATIONS_ATTR`` and the scope they cover is remembered
+    on every instance, so readers know when the prefetched rows are enough to answer a lookup.
+    """
+
+    def __init__(self, languages, fields=None):
+        self.languages = frozenset(languages)
+        self.fields = frozenset(fields) if fields is not None else None
+        queryset = Translation.objects.filter(language__in=self.languages)
+        if self.fields is not None:
+            queryset = queryset.filter(field_name__in=self.fields)
+        super().__init__('translations', queryset=queryset, to_attr=PREFETCHED_TRANSLATIONS_ATTR)
+
+
+def get_translated_annotation_name(field_name, language):
+    """Name of the ``annotate_translated`` annotation of ``field_name`` in ``language``, e.g. ``name_pt_br``."""
+    return f"{field_name}_{language.replace('-', '_').lower()}"
+
+
+class TranslatableQuerySet(models.QuerySet):
+    def annotate_translated(self, language, *fields):
+        """
+        Annotate the value of ``fields`` (all translatable fields by default) in ``language`` as
+        ``<field>_<language>``, falling back to the field itself when there is no translation.
+
+        The annotations can be used in ``filter``, ``order_by`` and ``values`` like any other column.
+        """
+        from django_restful_translator.storage import translated_value_expression
+
+        fields = fields or self.model.translatable_fields
+        return self.annotate(**{
+            get_translated_annotation_name(field_name, language): translated_value_expression(
+                self.model, field_name, language)
+            for field_name in fields
+        })
+
+    def filter_stale_translations(self, language, *fields):
+        """
+        Keep the objects with a translation of ``fields`` (all translatable fields by default) in ``language`` made
+        from an older version of the source text. Storages not tracking source texts have no stale translations.
+        """
+        from django_restful_translator.storage import get_storage
+
+        storage = get_storage(self.model)
+        if not storage.tracks_source_hash:
+            return self.none()
+        fields = fields or self.model.translatable_fields
+        return self.filter(reduce(operator.or_, (
+            Q(storage.stale_filter(self.model, field_name, language)) for field_name in fields
+        )))
+
+    def with_translations(self, language=None, fields=None):
+        """
+        Prefetch only the translations of ``language`` (the active language by default, or an iterable
+        of language codes) and, optionally, of the given ``fields``.
+        """
+        if language is None:
+            language = get_language()
+        languages = [language] if isinstance(language, str) else language
+        clone = self._chain()
+        clone._prefetch_related_lookups = tuple(
+            lookup for lookup in clone._prefetch_related_lookups if not isinstance(lookup, TranslationPrefetch)
+        ) + (TranslationPrefetch(languages, fields),)
+        return clone
+
+    def _prefetch_related_objects(self):
+        super()._prefetch_related_objects()
+        for lookup in self._prefetch_related_lookups:
+            if isinstance(lookup, TranslationPrefetch):
+                for obj in self._result_cache:
+                    setattr(obj, PREFETCH_SCOPE_ATTR, (lookup.languages, lookup.fields))
+
 
 class TranslatableModel(models.Model):
     translations = GenericRelation(Translation)
     translatable_fields = []
+    # A ``django_restful_translator.storage.TranslationStorage``, generic ``Translation`` rows when None.
+    translation_storage = None
+
+    objects = TranslatableQuerySet.as_manager()
 
     class Meta:
         abstract = True
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.clear_translation_cache()
+
+    def clear_translation_cache(self):
+        """Forget the translations loaded for this instance, so the next read sees the database again."""
+        for attr in (PREFETCHED_TRANSLATIONS_ATTR, PREFETCH_SCOPE_ATTR, TRANSLATION_INDEX_ATTR):
+            self.__dict__.pop(attr, None)
+        getattr(self, '_prefetched_objects_cache', {}).pop('translations', None)
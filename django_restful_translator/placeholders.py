@@ -0,0 +1,152 @@
+import html
+import re
+
+# Spans sent to providers as they are: HTML comments and tags, printf conversions (``%s``, ``%(name)s``, not
+# followed by a letter unless named, so ``20%de`` is text) and the opening brace of Python format fields and ICU
+# messages, whose end is found by ``pair_braces``.
+SPAN_PATTERN_SOURCE = (
+    r'<!--.*?-->'
+    r'|</?[A-Za-z][\w:-]*(?:\s[^<>]*)?/?>'
+    r'|%\(\w+\)[-#0+]*(?:\d+|\*)?(?:\.(?:\d+|\*))?[sdifrxXeEgG]'
+    r'|%%'
+    r'|%[-#0+]*(?:\d+|\*)?(?:\.(?:\d+|\*))?[sdifrxXeEgG](?![^\W\d_])'
+    r'|\{'
+)
+SPAN_PATTERN = re.compile(SPAN_PATTERN_SOURCE, re.DOTALL)
+# In the branches of plural messages, ``#`` stands for the number.
+PLURAL_SPAN_PATTERN = re.compile(SPAN_PATTERN_SOURCE + r'|#', re.DOTALL)
+# Start of ICU plural and select messages, up to their first branch.
+ICU_PATTERN = re.compile(r'\{\s*\w+\s*,\s*(plural|selectordinal|select)\s*,')
+# Selector of a branch, up to the opening brace of its text.
+BRANCH_PATTERN = re.compile(r'\s*(?:offset:\s*\d+\s+)?(?:=\d+|[\w-]+)\s*\{')
+BRACE_PATTERN = re.compile(r'[{}]')
+TOKEN_FORMAT = '__TOKEN{}__'
+
+
+def pair_braces(text):
+    """
+    ``{position of an opening brace: position after its closing brace}``, nested braces included, None for the
+    unbalanced ones. A single pass, so texts with many unclosed braces stay linear.
+    """
+    pairs = {}
+    opened = []
+    for match in BRACE_PATTERN.finditer(text):
+        if match.group() == '{':
+            opened.append(match.start())
+            pairs[match.start()] = None
+        elif opened:
+            pairs[opened.pop()] = match.end()
+    return pairs
+
+
+def iter_spans(text, start=0, end=None, plural=False, braces=None):
+    """
+    Yield the ``(start, end)`` positions of the spans of ``text[start:end]`` to protect, in order. ``braces`` is
+    ``pair_braces(text)``, computed when not given.
+    """
+    end = len(text) if end is None else end
+    if braces is None:
+        braces = pair_braces(text) if '{' in text else {}
+    position = start
+    for match in (PLURAL_SPAN_PATTERN if plural else SPAN_PATTERN).finditer(text, start, end):
+        span_start, span_end = match.span()
+        if span_start < position:
+            # Inside a format field or ICU message already protected.
+            continue
+        if match.group() == '{':
+            span_end = braces[span_start]
+            if span_end is None or span_end > end:
+                continue
+            # Format fields have no comma unless they are ICU messages, most of them skip the pattern.
+            icu_match = text.find(',', span_start, span_end) != -1 and ICU_PATTERN.match(text, span_start, span_end)
+            icu_spans = get_icu_spans(text, icu_match, span_end, braces) if icu_match else None
+            if icu_spans is not None:
+                yield from icu_spans
+                position = span_end
+                continue
+        yield span_start, span_end
+        position = span_end
+
+
+def get_icu_spans(text, match, end, braces):
+    """
+    Spans of the ICU message starting with ``match`` and ending at ``end``: its skeleton (argument, type,
+    selectors and braces) and the spans of its branch texts, which are translated. None when it is malformed.
+    """
+    plural = match.group(1) != 'select'
+    spans = []
+    skeleton_start = match.start()
+    position = match.end()
+    while True:
+        branch = BRANCH_PATTERN.match(text, position, end)
+        if branch is None:
+            break
+        branch_end = braces[branch.end() - 1]
+        if branch_end is None or branch_end > end:
+            return None
+        spans.append((skeleton_start, branch.end()))
+        spans.extend(iter_spans(text, branch.end(), branch_end - 1, plural, braces))
+        skeleton_start = branch_end - 1
+        position = branch_end
+    if not spans or text[position:end - 1].strip():
+        return None
+    spans.append((skeleton_start, end))
+    # Pieces of the skeleton with no text between them make a single span.
+    merged = [spans[0]]
+    for span_start, span_end in spans[1:]:
+        if span_start == merged[-1][1]:
+            merged[-1] = (merged[-1][0], span_end)
+        else:
+            merged.append((span_start, span_end))
+    return merged
+
+
+def get_token_pattern(span_format):
+    """Regex finding the spans of ``span_format`` in a translated text, tolerating added spaces and case changes."""
+    before, after = span_format.split('{}')
+    return re.compile(
+        r'\s*'.join(re.escape(part) for part in before.split()) + r'\s*(\d+)\s*'
+        + r'\s*'.join(re.escape(part) for part in after.split()),
+        re.IGNORECASE
+    )
+
+
+class SpanProtector:
+    """
+    Replace the protected spans of a text (see ``iter_spans``) by numbered tokens and put them back in the
+    translation, each in a single pass over the text.
+
+    ``markup`` is a format with a ``{}`` for the span number that the provider leaves untranslated, e.g.
+    ``'<span translate="no">{}</span>'``. The text around the spans is HTML-escaped then, as the provider reads
+    it as markup. Without ``markup`` the spans become ``__TOKEN<n>__`` tokens in plain text.
+    """
+
+    def __init__(self, markup=None):
+        self.markup = markup
+        self.span_format = markup or TOKEN_FORMAT
+        self.token_pattern = get_token_pattern(self.span_format)
+
+    def protect(self, text):
+        """Return the text to send and the list of its spans."""
+        parts, spans = [], []
+        position = 0
+        for start, end in iter_spans(text):
+            parts.append(self.escape(text[position:start]))
+            spans.append(text[start:end])
+            parts.append(self.span_format.format(len(spans)))
+            position = end
+        if not spans:
+            return self.escape(text), spans
+        parts.append(self.escape(text[position:]))
+        return ''.join(parts), spans
+
+    def restore(self, text, spans):
+        """Put ``spans`` back in place of their tokens, unknown tokens are left as they are."""
+        def replace(match):
+            number = int(match.group(1))
+            return spans[number - 1] if 0 < number <= len(spans) else match.group()
+
+        return self.token_pattern.sub(replace, text) if spans else text
+
+    def escape(self, text):
+        return html.escape(text, quote=False) if self.markup and text else text
@@ -0,0 +1,120 @@
+import itertools
+from collections import defaultdict
+from datetime import datetime
+
+import polib
+
+# Header of the files written by ``drt_makemessages`` telling when the database was read for them.
+WATERMARK_HEADER = 'X-DRT-Watermark'
+
+
+def get_reference(model, field_name, object_id):
+    """The line of an entry translator comment pointing to ``field_name`` of a ``model`` object."""
+    return f'{model._meta.model_name}__{field_name}__{object_id}'
+
+
+def get_watermark(po):
+    """The ``WATERMARK_HEADER`` of ``po``, None when it has none."""
+    try:
+        return datetime.fromisoformat(po.metadata[WATERMARK_HEADER])
+    except (KeyError, ValueError):
+        return None
+
+
+class POBuilder:
+    """
+    Add translations to a ``polib.POFile`` in time linear in their number.
+
+    Entries are indexed by msgid the way ``POFile.find(msgid)`` finds them: entries that are not obsolete, the last
+    one without msgctxt, else the first one. The references of an entry (the ``<model>__<field>__<id>`` lines of its
+    translator comment) are kept in an ordered set, the comment is rebuilt once when the file is saved.
+
+    Entries left without references by ``move`` and ``remove`` become obsolete when the file is saved, as
+    ``makemessages`` does with the messages gone from the code.
+    """
+
+    def __init__(self, po=None):
+        self.po = po if po is not None else polib.POFile()
+        self.entries = {}
+        self.references = {}
+        self.locations = None
+        for entry in self.po:
+            if entry.obsolete:
+                continue
+            if entry.msgid not in self.entries or not entry.msgctxt:
+                self.entries[entry.msgid] = entry
+
+    def add(self, msgid, msgstr, reference):
+        """Add ``reference`` to the entry of ``msgid``, creating it with ``msgstr`` when there is none."""
+        entry = self.entries.get(msgid)
+        if entry is None:
+            entry = polib.POEntry(msgid=msgid, msgstr=msgstr, tcomment=reference)
+            if not msgstr:
+                entry.flags.append('fuzzy')
+            self.po.append(entry)
+            self.entries[msgid] = entry
+        else:
+            self.get_references(msgid)[reference] = None
+        if self.locations is not None:
+            self.locations[reference].add(msgid)
+        return entry
+
+    def move(self, msgid, msgstr, reference):
+        """Like ``add``, also removing ``reference`` from the entries of other msgids."""
+        locations = self.get_locations()[reference]
+        for other in locations - {msgid}:
+            self.get_references(other).pop(reference, None)
+            locations.discard(other)
+        if msgid in locations:
+            return self.entries[msgid]
+        return self.add(msgid, msgstr, reference)
+
+    def remove(self, reference):
+        """Remove ``reference`` from every entry."""
+        for msgid in self.get_locations().pop(reference, ()):
+            self.get_references(msgid).pop(reference, None)
+
+    def get_references(self, msgid):
+        references = self.references.get(msgid)
+        if references is None:
+            references = self.references[msgid] = dict.fromkeys(self.entries[msgid].tcomment.splitlines())
+        return references
+
+    def get_locations(self):
+        """The msgids of the entries of every reference, indexed on first use."""
+        if self.locations is None:
+            self.locations = defaultdict(set)
+            for msgid, entry in self.entries.items():
+                references = self.references.get(msgid)
+                for reference in entry.tcomment.splitlines() if references is None else references:
+                    self.locations[reference].add(msgid)
+        return self.locations
+
+    def save(self, path):
+        for msgid, references in self.references.items():
+            entry = self.entries[msgid]
+            entry.tcomment = '\n'.join(references)
+            if not references:
+                entry.obsolete = True
+                del self.entries[msgid]
+        self.references = {}
+        write_po_file(self.po, path)
+
+
+def write_po_file(po, path):
+    """Write ``po`` as ``POFile.save`` does, entry by entry rather than building the whole file in memory first."""
+    with open(path, 'w', encoding=po.encoding) as file:
+        for header in po.header.split('\n'):
+            if not header:
+                file.write('#\n')
+            elif header[:1] in (',', ':'):
+                file.write(f'#{header}\n')
+            else:
+                file.write(f'# {header}\n')
+        entries = itertools.chain(
+            [po.metadata_as_entry()], (entry for entry in po if not entry.obsolete), po.obsolete_entries()
+        )
+        for index, entry in enumerate(entries):
+            if index:
+                file.write('\n')
+            file.write(entry.__unicode__(po.wrapwidth))
@@ -0,0 +1,74 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` units per second on average, with bursts of up to ``capacity`` units.
+
+    ``reserve`` takes the units right away and returns how long the caller has to wait before using them, so
+    callers decide how to wait (``time.sleep`` or ``asyncio.sleep``) and never hold the lock while waiting.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+
+class ProviderScheduler:
+    """
+    Paces the requests sent to a provider.
+
+    Requests wait for the ``requests_per_second`` and ``characters_per_second`` budgets (unlimited when None).
+    Failed requests are retried after an exponential backoff with full jitter. The number of requests in flight
+    is halved whenever the provider throttles, and grows back by one after every ``concurrency`` successes.
+    """
+
+    def __init__(self, max_concurrency, requests_per_second=None, characters_per_second=None, max_retries=5,
+                 base_delay=1.0, max_delay=60.0):
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.character_bucket = TokenBucket(characters_per_second) if characters_per_second else None
+        self.successes = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, characters):
+        """Return the seconds to wait before sending a request with ``characters`` characters."""
+        delay = 0.0
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.character_bucket:
+            delay = max(delay, self.character_bucket.reserve(characters))
+        return delay
+
+    def get_backoff(self, attempt):
+        """Seconds to wait before retrying a request that failed ``attempt + 1`` times."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def record_success(self):
+        with self.lock:
+            self.successes += 1
+            if self.successes >= self.concurrency:
+                self.successes = 0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+    def record_throttle(self):
+        with self.lock:
+            self.successes = 0
+            self.concurrency = max(1, self.concurrency // 2)
@@ -0,0 +1,26 @@
+from django.contrib.contenttypes.models import ContentType
+
+from django_restful_translator import cache as translation_cache
+from django_restful_translator import changes
+from django_restful_translator.models import TranslatableModel
+
+
+def invalidate_translation_cache(sender, instance, **kwargs):
+    # All languages are dropped, the row may have been moved to another language.
+    if translation_cache.is_enabled():
+        translation_cache.invalidate(instance.content_type_id, instance.object_id)
+
+
+def invalidate_object_translation_cache(sender, instance, **kwargs):
+    if translation_cache.is_enabled() and isinstance(instance, TranslatableModel):
+        translation_cache.invalidate(ContentType.objects.get_for_model(instance).pk, instance.pk)
+
+
+def record_object_change(sender, instance, **kwargs):
+    if changes.is_enabled() and isinstance(instance, TranslatableModel):
+        changes.record_changes(type(instance), [instance.pk])
+
+
+def record_object_deletion(sender, instance, **kwargs):
+    if changes.is_enabled() and isinstance(instance, TranslatableModel):
+        changes.record_changes(type(instance), [instance.pk], deleted=True)
@@ -0,0 +1,775 @@
+import hashlib
+import operator
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from functools import reduce
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, models, router, transaction
+from django.db.models import Exists, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import SHA256, Cast, Coalesce, NullIf
+from django.db.models.lookups import IsNull
+from django.utils import timezone
+
+from django_restful_translator import cache as translation_cache
+from django_restful_translator import changes
+from django_restful_translator.models import (
+    ModelTranslation,
+    PREFETCH_SCOPE_ATTR,
+    PREFETCHED_TRANSLATIONS_ATTR,
+    TRANSLATION_INDEX_ATTR,
+    TranslatableModel,
+    TranslatableQuerySet,
+    Translation,
+    get_typed_object_key_field,
+    object_id_filter,
+    use_typed_object_key,
+)
+
+FETCH_CHUNK_SIZE = 2000
+
+
+def covers_scope(scope, languages, fields=None):
+    """Whether translations loaded with ``scope`` contain every row of ``languages`` and ``fields``."""
+    if scope is None:
+        return False
+    scope_languages, scope_fields = scope
+    if scope_languages is not None and not scope_languages.issuperset(languages):
+        return False
+    return scope_fields is None or (fields is not None and scope_fields.issuperset(fields))
+
+
+def hash_source(text):
+    """Hash of a source text as ``source_hash`` columns store it, the ``SHA256`` database function gives the same."""
+    return hashlib.sha256((text or '').encode()).hexdigest()
+
+
+def get_source_hash(instance, field_name):
+    """
+    Hash of the source text of ``field_name`` on ``instance``, empty when the instance doesn't hold the stored
+    value (unsaved, or the field is deferred).
+    """
+    if instance._state.adding or field_name in instance.get_deferred_fields():
+        return ''
+    return hash_source(getattr(instance, field_name))
+
+
+def get_stored_source_hash(current, value, source_hash):
+    """
+    Source hash to store with ``value`` over the ``(pk, field_value, source_hash)`` row ``current``, None when the
+    row doesn't need writing. A known hash is kept when ``source_hash`` is unknown, as for values read from .po files.
+    """
+    if current is None:
+        return source_hash
+    if current[1] == value and (not source_hash or current[2] in ('', source_hash)):
+        return None
+    return source_hash or current[2]
+
+
+def load_instance(model, object_pk, values):
+    """A ``model`` instance as if loaded from the database with only its primary key and ``values``."""
+    values = {model._meta.pk.attname: object_pk, **values}
+    field_names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(router.db_for_read(model), field_names, [values[name] for name in field_names])
+
+
+def build_translation_index(translations):
+    values = defaultdict(dict)
+    for trans in translations:
+        values[trans.field_name][trans.language] = trans.field_value
+    return values
+
+
+class TranslationRecord:
+    """
+    Translation of one field of one object, as yielded by ``TranslationStorage.fetch``.
+
+    Records only keep the primary key of the object and the source text, so streaming a large table doesn't
+    keep model instances alive.
+    """
+    __slots__ = ('storage', 'model', 'object_pk', 'field_name', 'language', 'source_value', 'field_value')
+
+    def __init__(self, storage, model, object_pk, field_name, language, source_value, field_value):
+        self.storage = storage
+        self.model = model
+        self.object_pk = object_pk
+        self.field_name = field_name
+        self.language = language
+        self.source_value = source_value
+        self.field_value = field_value
+
+    @property
+    def object_id(self):
+        return str(self.object_pk)
+
+    def save(self):
+        instance = load_instance(self.model, self.object_pk, {self.field_name: self.source_value})
+        self.storage.save([(instance, {(self.field_name, self.language): self.field_value})])
+
+
+def iter_objects(queryset, chunk_size):
+    """Yield the objects of ``queryset`` in lists of ``chunk_size``, paginating on the primary key."""
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def get_languages(language):
+    """A language code, or a list of them, as a list."""
+    return [language] if isinstance(language, str) else list(language)
+
+
+def iter_chunks(iterable, chunk_size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class TranslationStorage(ABC):
+    """
+    Where the translations of a ``TranslatableModel`` are kept.
+
+    Pick one per model with the ``translation_storage`` attribute, ``GenericTranslationStorage`` is used when it
+    is not set.
+    """
+    # Whether the hash of the source text of every translation is stored, see ``stale_filter``.
+    tracks_source_hash = False
+
+    @abstractmethod
+    def get_index(self, instance, languages, field_name):
+        """Return the translations of ``instance`` as ``{field_name: {language: value}}``."""
+
+    def attach(self, instances, languages, fields=None):
+        """Load the translations of ``instances`` ahead of ``get_index`` calls."""
+
+    def prepare_queryset(self, queryset, languages):
+        """Return ``queryset`` set up to load the translations of ``languages`` with the objects."""
+        return queryset
+
+    @abstractmethod
+    def save(self, items, batch_size=None, created=False):
+        """
+        Write ``(instance, {(field_name, language): value})`` pairs, skipping unchanged values.
+        Returns the number of written values.
+
+        Storages tracking source texts record the hash of the source each value was translated from, taken from
+        instances loaded from the database (see ``get_source_hash``).
+        """
+
+    def fetch(self, model, language, chunk_size=FETCH_CHUNK_SIZE, object_ids=None):
+        """
+        Yield a ``TranslationRecord`` per non-empty translatable field of every ``model`` object, or of the
+        objects with the primary keys ``object_ids``, holding the stored translation in ``language`` or an empty
+        string (the source text for the default language). ``language`` may be a list of languages, the objects
+        are then read once for all of them.
+
+        Objects are streamed ``chunk_size`` at a time with only the columns needed, and the translations of each
+        chunk are loaded with one query. Chunks are read by primary key ranges rather than through a
+        cursor left open between them, so consumers may write translations while iterating (SQLite would lock).
+        """
+        languages = get_languages(language)
+        queryset = model.objects.only(*self.get_source_fields(model))
+        if object_ids is None:
+            chunks = iter_objects(queryset, chunk_size)
+        else:
+            chunks = (
+                list(queryset.filter(pk__in=chunk).order_by('pk'))
+                for chunk in iter_chunks(sorted(object_ids), chunk_size)
+            )
+        for objects in chunks:
+            values = self.get_values_by_language(model, objects, languages)
+            for obj in objects:
+                for field_name in model.translatable_fields:
+                    source_value = getattr(obj, field_name)
+                    if source_value is None or source_value == '':
+                        continue
+                    for language in languages:
+                        field_value = values[language].get((str(obj.pk), field_name))
+                        if field_value is None:
+                            field_value = source_value if language == settings.LANGUAGE_CODE else ''
+                        yield TranslationRecord(self, model, obj.pk, field_name, language, source_value, field_value)
+
+    def get_source_fields(self, model):
+        """Columns ``fetch`` loads from the ``model`` table."""
+        return list(model.translatable_fields)
+
+    @abstractmethod
+    def get_values(self, model, objects, language):
+        """Return the stored translations of ``objects`` in ``language`` as ``{(object_id, field_name): value}``."""
+
+    def get_values_by_language(self, model, objects, languages):
+        """Like ``get_values`` for each of ``languages``, as ``{language: {(object_id, field_name): value}}``."""
+        return {language: self.get_values(model, objects, language) for language in languages}
+
+    @abstractmethod
+    def translated_expression(self, model, field_name, language):
+        """Expression of ``field_name`` translated in ``language``, NULL when there is no translation."""
+
+    def fetch_missing(self, model, language, chunk_size=FETCH_CHUNK_SIZE):
+        """
+        Yield a ``TranslationRecord`` per non-empty translatable field of ``model`` objects with no translation
+        (or an empty one) in ``language``, or in each language of a list.
+
+        Both conditions are checked by the database, so the cost follows the amount of missing translations
+        rather than the size of the table. With several languages each field is read once, flagged with the
+        languages it is missing in.
+        """
+        return self.fetch_matching(model, language, self.missing_filter, chunk_size)
+
+    def fetch_stale(self, model, language, chunk_size=FETCH_CHUNK_SIZE):
+        """Like ``fetch_missing``, for the translations made from another source text than the current one."""
+        return self.fetch_matching(model, language, self.stale_filter, chunk_size)
+
+    def fetch_matching(self, model, language, condition, chunk_size=FETCH_CHUNK_SIZE):
+        """
+        Yield a ``TranslationRecord`` per non-empty translatable field of ``model`` objects matching
+        ``condition(model, field_name, language)``.
+        """
+        languages = get_languages(language)
+        flags = {f'_matching_{index}': language for index, language in enumerate(languages)}
+        for field_name in model.translatable_fields:
+            queryset = model.objects.annotate(**{
+                flag: condition(model, field_name, language) for flag, language in flags.items()
+            }).filter(
+                reduce(operator.or_, (Q(**{flag: True}) for flag in flags))
+            ).exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''}).only(field_name)
+            for objects in iter_objects(queryset, chunk_size):
+                for obj in objects:
+                    for flag, language in flags.items():
+                        if getattr(obj, flag):
+                            yield TranslationRecord(
+                                self, model, obj.pk, field_name, language, getattr(obj, field_name), ''
+                            )
+
+    def missing_filter(self, model, field_name, language):
+        """Condition matching the ``model`` objects without a non-empty translation of ``field_name``."""
+        translated = self.translated_expression(model, field_name, language)
+        return IsNull(NullIf(translated, Value(''), output_field=models.TextField()), True)
+
+    def stale_filter(self, model, field_name, language):
+        """
+        Condition matching the ``model`` objects with a translation of ``field_name`` made from another source
+        text. Translations saved without a source hash are not stale.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not track source texts')
+
+    def last_updated(self, model, language):
+        """When a translation of ``model`` in ``language`` was last written, None when unknown."""
+        return None
+
+    def changed_objects(self, model, language, since):
+        """
+        Primary keys of the ``model`` objects with a translation in ``language`` (or a list of languages) written
+        since ``since``. Storages keeping the translations on the object record their writes as changes of the
+        object instead (see ``changes``).
+        """
+        return set()
+
+    def delete(self, model, object_ids):
+        """Remove every translation of the ``model`` objects with these primary keys."""
+        raise NotImplementedError(f'{type(self).__name__} does not support deleting translations')
+
+
+class GenericTranslationStorage(TranslationStorage):
+    """Translations stored as ``Translation`` rows pointing to their object through a generic relation."""
+    tracks_source_hash = True
+
+    def get_index(self, instance, languages, field_name):
+        """
+        The index is built once from the prefetched rows, the translation cache or the ``translations`` relation
+        and memoized on the instance until ``clear_translation_cache`` is called.
+        """
+        index = getattr(instance, TRANSLATION_INDEX_ATTR, None)
+        if index is not None and covers_scope(index[0], languages, [field_name]):
+            return index[1]
+
+        scope = getattr(instance, PREFETCH_SCOPE_ATTR, None)
+        translations = getattr(instance, PREFETCHED_TRANSLATIONS_ATTR, None)
+        if translations is not None and covers_scope(scope, languages, [field_name]):
+            setattr(instance, TRANSLATION_INDEX_ATTR, (scope, build_translation_index(translations)))
+        elif translation_cache.is_enabled() and not self.has_prefetched_relation(instance):
+            self.attach([instance], languages)
+        else:
+            setattr(instance, TRANSLATION_INDEX_ATTR,
+                    ((None, None), build_translation_index(instance.translations.all())))
+        return getattr(instance, TRANSLATION_INDEX_ATTR)[1]
+
+    def has_prefetched_relation(self, instance):
+        return 'translations' in getattr(instance, '_prefetched_objects_cache', {})
+
+    def attach(self, instances, languages, fields=None):
+        """
+        Translations are read from the translation cache when it is enabled, and whatever is missing is loaded
+        with a single query (and written back to the cache).
+        """
+        use_cache = translation_cache.is_enabled()
+        if use_cache:
+            # Cache entries hold every field of a language.
+            fields = None
+        scope = (frozenset(languages), frozenset(fields) if fields is not None else None)
+        pending = defaultdict(list)
+        for instance in instances:
+            if not isinstance(instance, TranslatableModel):
+                continue
+            index = getattr(instance, TRANSLATION_INDEX_ATTR, None)
+            if covers_scope(getattr(instance, PREFETCH_SCOPE_ATTR, None), *scope) or (
+                    index is not None and covers_scope(index[0], *scope)):
+                continue
+            pending[type(instance)].append(instance)
+        if not pending:
+            return
+
+        content_types = ContentType.objects.get_for_models(*pending)
+        indexes = defaultdict(lambda: defaultdict(dict))
+        lookups = Q()
+        missing = {}
+        for model, model_instances in pending.items():
+            content_type_id = content_types[model].pk
+            object_ids = {str(obj.pk) for obj in model_instances}
+            if use_cache:
+                cached = translation_cache.get_many(content_type_id, object_ids, scope[0])
+                for (object_id, language), values in cached.items():
+                    for field_name, value in values.items():
+                        indexes[(content_type_id, object_id)][field_name][language] = value
+                object_ids = {
+                    object_id for object_id in object_ids
+                    if any((object_id, language) not in cached for language in scope[0])
+                }
+            if object_ids:
+                lookups |= Q(content_type_id=content_type_id) & object_id_filter(model, object_ids)
+                missing[content_type_id] = {
+                    (object_id, language): {} for object_id in object_ids for language in scope[0]
+                }
+
+        if missing:
+            queryset = Translation.objects.filter(lookups, language__in=scope[0])
+            if scope[1] is not None:
+                queryset = queryset.filter(field_name__in=scope[1])
+            for trans in queryset:
+                indexes[(trans.content_type_id, trans.object_id)][trans.field_name][trans.language] = trans.field_value
+                missing[trans.content_type_id][(trans.object_id, trans.language)][trans.field_name] = trans.field_value
+            if use_cache:
+                for content_type_id, values_by_object in missing.items():
+                    translation_cache.set_many(content_type_id, values_by_object)
+
+        for model, model_instances in pending.items():
+            content_type_id = content_types[model].pk
+            for instance in model_instances:
+                setattr(instance, TRANSLATION_INDEX_ATTR, (scope, indexes[(content_type_id, str(instance.pk))]))
+
+    def prepare_queryset(self, queryset, languages):
+        if isinstance(queryset, TranslatableQuerySet) and not translation_cache.is_enabled():
+            return queryset.with_translations(languages)
+        return queryset
+
+    def save(self, items, batch_size=None, created=False):
+        """
+        Changed rows are written with one upsert (or a ``bulk_update`` plus a ``bulk_create`` on backends without
+        conflict handling) inside a single transaction. ``created=True`` tells that the instances were just created,
+        so there are no existing rows to look up.
+        """
+        items = [(instance, values) for instance, values in items if values]
+        if not items:
+            return 0
+
+        content_types = ContentType.objects.get_for_models(*{type(instance) for instance, values in items})
+        lookups = Q()
+        languages, fields = set(), set()
+        for instance, values in items:
+            lookups |= Q(content_type=content_types[type(instance)], object_id=str(instance.pk))
+            fields.update(field_name for field_name, language in values)
+            languages.update(language for field_name, language in values)
+
+        db = router.db_for_write(Translation)
+        with transaction.atomic(using=db):
+            existing = {}
+            if not created:
+                rows = Translation.objects.using(db).filter(
+                    lookups, language__in=languages, field_name__in=fields
+                ).order_by().values_list(
+                    'pk', 'content_type_id', 'object_id', 'field_name', 'language', 'field_value', 'source_hash'
+                )
+                existing = {
+                    (content_type_id, object_id, field_name, language): (pk, field_value, source_hash)
+                    for pk, content_type_id, object_id, field_name, language, field_value, source_hash in rows
+                }
+
+            to_create, to_update = [], []
+            now = timezone.now()
+            for instance, values in items:
+                content_type = content_types[type(instance)]
+                for (field_name, language), value in values.items():
+                    current = existing.get((content_type.pk, str(instance.pk), field_name, language))
+                    source_hash = get_stored_source_hash(current, value, get_source_hash(instance, field_name))
+                    if source_hash is None:
+                        continue
+                    trans = Translation(
+                        pk=current[0] if current else None,
+                        content_type=content_type,
+                        object_id=str(instance.pk),
+                        field_name=field_name,
+                        language=language,
+                        field_value=value,
+                        source_hash=source_hash,
+                        updated_at=now
+                    )
+                    trans.set_typed_object_key()
+                    (to_update if current else to_create).append(trans)
+
+            if getattr(connections[db].features, 'supports_update_conflicts_with_target', False):
+                for trans in to_update:
+                    trans.pk = None
+                Translation.objects.using(db).bulk_create(
+                    to_update + to_create,
+                    batch_size=batch_size,
+                    update_conflicts=True,
+                    unique_fields=['content_type', 'object_id', 'language', 'field_name'],
+                    update_fields=['field_value', 'source_hash', 'updated_at']
+                )
+            else:
+                Translation.objects.using(db).bulk_update(to_update, ['field_value', 'source_hash', 'updated_at'],
+                                                          batch_size=batch_size)
+                Translation.objects.using(db).bulk_create(to_create, batch_size=batch_size)
+
+        if translation_cache.is_enabled():
+            # Bulk queries don't send the signals that keep the cache up to date.
+            for instance, values in items:
+                translation_cache.invalidate(content_types[type(instance)].pk, instance.pk)
+        return len(to_create) + len(to_update)
+
+    def get_values(self, model, objects, language):
+        return self.get_values_by_language(model, objects, [language])[language]
+
+    def get_values_by_language(self, model, objects, languages):
+        values = {language: {} for language in languages}
+        translations = Translation.objects.filter(
+            object_id_filter(model, [obj.pk for obj in objects]),
+            content_type=ContentType.objects.get_for_model(model),
+            language__in=languages
+        ).order_by().values_list('object_id', 'language', 'field_name', 'field_value')
+        for object_id, language, field_name, field_value in translations:
+            values[language][(object_id, field_name)] = field_value
+        return values
+
+    def get_outer_translations(self, model, field_name, language):
+        """Translations of ``field_name`` in ``language`` of the object of the outer query."""
+        key_field = get_typed_object_key_field(model) if use_typed_object_key() else None
+        object_key = OuterRef('pk') if key_field else Cast(OuterRef('pk'), models.CharField())
+        return Translation.objects.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            language=language,
+            field_name=field_name,
+            **{key_field or 'object_id': object_key}
+        ).order_by()
+
+    def translated_expression(self, model, field_name, language):
+        return Subquery(self.get_outer_translations(model, field_name, language).values('field_value')[:1])
+
+    def missing_filter(self, model, field_name, language):
+        return ~Exists(self.get_outer_translations(model, field_name, language).exclude(field_value=''))
+
+    def stale_filter(self, model, field_name, language):
+        return Exists(self.get_outer_translations(model, field_name, language).exclude(field_value='').exclude(
+            source_hash=''
+        ).exclude(source_hash=SHA256(Coalesce(OuterRef(field_name), Value('')))))
+
+    def last_updated(self, model, language):
+        """The rows of every model share one table, this is the last update of any of them."""
+        return Translation.objects.filter(language=language).aggregate(last_updated=Max('updated_at'))['last_updated']
+
+    def changed_objects(self, model, language, since):
+        object_ids = Translation.objects.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            language__in=get_languages(language),
+            updated_at__gte=since
+        ).order_by().values_list('object_id', flat=True).distinct()
+        return {model._meta.pk.to_python(object_id) for object_id in object_ids}
+
+    def delete(self, model, object_ids):
+        content_type = ContentType.objects.get_for_model(model)
+        Translation.objects.filter(object_id_filter(model, object_ids), content_type=content_type).delete()
+        if translation_cache.is_enabled():
+            for object_id in object_ids:
+                translation_cache.invalidate(content_type.pk, object_id)
+
+
+class JSONTranslationStorage(TranslationStorage):
+    """
+    Translations stored on the object itself, in a ``JSONField`` holding ``{field_name: {language: value}}``.
+
+    Reads need no query at all. The model declares the field, e.g.
+    ``translation_values = models.JSONField(default=dict, blank=True)``.
+    """
+
+    def __init__(self, field_name='translation_values'):
+        self.field_name = field_name
+
+    def get_index(self, instance, languages, field_name):
+        return getattr(instance, self.field_name) or {}
+
+    def save(self, items, batch_size=None, created=False):
+        """
+        The current values are re-read from the database before merging, so values written by others since
+        the instances were loaded are kept.
+        """
+        items = [(instance, values) for instance, values in items if values]
+        by_model = defaultdict(list)
+        for instance, values in items:
+            by_model[type(instance)].append((instance, values))
+
+        written = 0
+        for model, model_items in by_model.items():
+            db = router.db_for_write(model)
+            with transaction.atomic(using=db):
+                current = {}
+                if not created:
+                    current = {
+                        str(pk): stored for pk, stored in model._default_manager.using(db).filter(
+                            pk__in=[instance.pk for instance, values in model_items]
+                        ).select_for_update().values_list('pk', self.field_name)
+                    }
+
+                to_update = []
+                for instance, values in model_items:
+                    stored = current.get(str(instance.pk)) if not created else getattr(instance, self.field_name)
+                    stored = {field_name: dict(languages) for field_name, languages in (stored or {}).items()}
+                    changed = 0
+                    for (field_name, language), value in values.items():
+                        if stored.get(field_name, {}).get(language) != value:
+                            stored.setdefault(field_name, {})[language] = value
+                            changed += 1
+                    setattr(instance, self.field_name, stored)
+                    if changed:
+                        to_update.append(instance)
+                        written += changed
+                model._default_manager.using(db).bulk_update(to_update, [self.field_name], batch_size=batch_size)
+                if to_update and changes.is_enabled():
+                    changes.record_changes(model, [instance.pk for instance in to_update])
+        return written
+
+    def get_source_fields(self, model):
+        return [*model.translatable_fields, self.field_name]
+
+    def get_values(self, model, objects, language):
+        values = {}
+        for obj in objects:
+            for field_name, languages in (getattr(obj, self.field_name) or {}).items():
+                if languages.get(language) is not None:
+                    values[(str(obj.pk), field_name)] = languages[language]
+        return values
+
+    def translated_expression(self, model, field_name, language):
+        return KeyTextTransform(language, KeyTransform(field_name, self.field_name))
+
+    def delete(self, model, object_ids):
+        model._default_manager.filter(pk__in=object_ids).update(**{self.field_name: {}})
+        # ``update`` sends no ``post_save``.
+        if changes.is_enabled():
+            changes.record_changes(model, object_ids)
+
+
+class TableTranslationStorage(TranslationStorage):
+    """
+    Translations stored in a table of their own per model, with a foreign key to the translated object.
+
+    The translation model (``<Model>Translation``) is generated in the app of the model when the storage is
+    assigned, so ``makemigrations`` picks it up. A storage instance serves a single model.
+    """
+
+    tracks_source_hash = True
+
+    def __init__(self, related_name='model_translations', model_name=None):
+        self.related_name = related_name
+        self.model_name = model_name
+        self.translation_model = None
+
+    def contribute_to_class(self, cls, name):
+        setattr(cls, name, self)
+        if cls._meta.abstract:
+            return
+        if self.translation_model is not None:
+            raise ValueError(f'{cls.__name__} needs a TableTranslationStorage of its own, this one already stores '
+                             f'{self.translation_model.__name__}')
+        self.translation_model = create_translation_model(cls, self.related_name, self.model_name)
+
+    def get_index(self, instance, languages, field_name):
+        index = getattr(instance, TRANSLATION_INDEX_ATTR, None)
+        if index is None or not covers_scope(index[0], languages, [field_name]):
+            rows = getattr(instance, '_prefetched_objects_cache', {}).get(self.related_name)
+            if rows is None:
+                rows = self.translation_model._default_manager.filter(master_id=self.get_master_id(instance))
+            index = ((None, None), build_translation_index(rows))
+            setattr(instance, TRANSLATION_INDEX_ATTR, index)
+        return index[1]
+
+    def attach(self, instances, languages, fields=None):
+        scope = (frozenset(languages), frozenset(fields) if fields is not None else None)
+        pending = []
+        for instance in instances:
+            index = getattr(instance, TRANSLATION_INDEX_ATTR, None)
+            if index is None or not covers_scope(index[0], *scope):
+                pending.append(instance)
+        if not pending:
+            return
+        queryset = self.translation_model._default_manager.filter(
+            master_id__in={self.get_master_id(instance) for instance in pending}, language__in=scope[0]
+        )
+        if scope[1] is not None:
+            queryset = queryset.filter(field_name__in=scope[1])
+        indexes = defaultdict(lambda: defaultdict(dict))
+        for master_id, field_name, language, field_value in queryset.values_list(
+                'master_id', 'field_name', 'language', 'field_value'):
+            indexes[master_id][field_name][language] = field_value
+        for instance in pending:
+            setattr(instance, TRANSLATION_INDEX_ATTR, (scope, indexes[self.get_master_id(instance)]))
+
+    def get_master_id(self, instance):
+        """Primary key of ``instance`` as the database returns it, instances may be built from string keys."""
+        return instance._meta.pk.to_python(instance.pk)
+
+    def save(self, items, batch_size=None, created=False):
+        items = [(instance, values) for instance, values in items if values]
+        if not items:
+            return 0
+        manager = self.translation_model._default_manager
+        db = router.db_for_write(self.translation_model)
+        with transaction.atomic(using=db):
+            existing = {}
+            if not created:
+                fields = {field_name for instance, values in items for field_name, language in values}
+                languages = {language for instance, values in items for field_name, language in values}
+                rows = manager.using(db).filter(
+                    master_id__in={self.get_master_id(instance) for instance, values in items},
+                    language__in=languages,
+                    field_name__in=fields
+                ).values_list('pk', 'master_id', 'field_name', 'language', 'field_value', 'source_hash')
+                existing = {
+                    (master_id, field_name, language): (pk, field_value, source_hash)
+                    for pk, master_id, field_name, language, field_value, source_hash in rows
+                }
+
+            to_create, to_update = [], []
+            now = timezone.now()
+            for instance, values in items:
+                master_id = self.get_master_id(instance)
+                for (field_name, language), value in values.items():
+                    current = existing.get((master_id, field_name, language))
+                    source_hash = get_stored_source_hash(current, value, get_source_hash(instance, field_name))
+                    if source_hash is None:
+                        continue
+                    trans = self.translation_model(
+                        pk=current[0] if current else None,
+                        master_id=master_id,
+                        field_name=field_name,
+                        language=language,
+                        field_value=value,
+                        source_hash=source_hash,
+                        updated_at=now
+                    )
+                    (to_update if current else to_create).append(trans)
+
+            if getattr(connections[db].features, 'supports_update_conflicts_with_target', False):
+                for trans in to_update:
+                    trans.pk = None
+                manager.using(db).bulk_create(
+                    to_update + to_create,
+                    batch_size=batch_size,
+                    update_conflicts=True,
+                    unique_fields=['master', 'language', 'field_name'],
+                    update_fields=['field_value', 'source_hash', 'updated_at']
+                )
+            else:
+                manager.using(db).bulk_update(to_update, ['field_value', 'source_hash', 'updated_at'],
+                                              batch_size=batch_size)
+                manager.using(db).bulk_create(to_create, batch_size=batch_size)
+        return len(to_create) + len(to_update)
+
+    def get_values(self, model, objects, language):
+        return self.get_values_by_language(model, objects, [language])[language]
+
+    def get_values_by_language(self, model, objects, languages):
+        values = {language: {} for language in languages}
+        translations = self.translation_model._default_manager.filter(
+            master_id__in=[obj.pk for obj in objects], language__in=languages
+        ).order_by().values_list('master_id', 'language', 'field_name', 'field_value')
+        for master_id, language, field_name, field_value in translations:
+            values[language][(str(master_id), field_name)] = field_value
+        return values
+
+    def get_outer_translations(self, model, field_name, language):
+        """Translations of ``field_name`` in ``language`` of the object of the outer query."""
+        return self.translation_model._default_manager.filter(
+            master=OuterRef('pk'), language=language, field_name=field_name
+        ).order_by()
+
+    def translated_expression(self, model, field_name, language):
+        return Subquery(self.get_outer_translations(model, field_name, language).values('field_value')[:1])
+
+    def missing_filter(self, model, field_name, language):
+        return ~Exists(self.get_outer_translations(model, field_name, language).exclude(field_value=''))
+
+    def stale_filter(self, model, field_name, language):
+        return Exists(self.get_outer_translations(model, field_name, language).exclude(field_value='').exclude(
+            source_hash=''
+        ).exclude(source_hash=SHA256(Coalesce(OuterRef(field_name), Value('')))))
+
+    def last_updated(self, model, language):
+        return self.translation_model._default_manager.filter(language=language).aggregate(
+            last_updated=Max('updated_at'))['last_updated']
+
+    def changed_objects(self, model, language, since):
+        return set(self.translation_model._default_manager.filter(
+            language__in=get_languages(language), updated_at__gte=since
+        ).order_by().values_list('master_id', flat=True).distinct())
+
+    def delete(self, model, object_ids):
+        self.translation_model._default_manager.filter(master_id__in=object_ids).delete()
+
+
+def create_translation_model(model, related_name, model_name=None):
+    """Create the ``ModelTranslation`` subclass holding the translations of ``model``."""
+    meta = type('Meta', (), {
+        'app_label': model._meta.app_label,
+        'unique_together': ('master', 'language', 'field_name'),
+        'indexes': [models.Index(fields=['language', 'updated_at'])],
+    })
+    return type(model_name or f'{model.__name__}Translation', (ModelTranslation,), {
+        '__module__': model.__module__,
+        'Meta': meta,
+        'master': models.ForeignKey(model, on_delete=models.CASCADE, related_name=related_name),
+    })
+
+
+generic_storage = GenericTranslationStorage()
+
+
+def get_storage(model):
+    return getattr(model, 'translation_storage', None) or generic_storage
+
+
+def group_by_storage(items, key=None):
+    """Group model instances (or items holding one, see ``key``) by the storage of their model."""
+    groups = defaultdict(list)
+    for item in items:
+        groups[get_storage(type(key(item) if key else item))].append(item)
+    return groups.items()
+
+
+def translated_value_expression(model, field_name, language):
+    """``field_name`` in ``language``, falling back to the field itself when the translation is missing or empty."""
+    if language == settings.LANGUAGE_CODE:
+        return F(field_name)
+    translated = get_storage(model).translated_expression(model, field_name, language)
+    return Coalesce(NullIf(translated, Value('')), F(field_name), output_field=models.TextField())
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import (
     Iterable,
@@ -6,35 +7,78 @@ from typing import (
 
 import boto3
 import deepl
+from botocore import exceptions as botocore_exceptions
 from django.conf import settings
+from google.api_core import exceptions as google_exceptions
 from google.cloud import translate_v2, translate
 
 
 class TranslationProvider(ABC):
     name = "Base Provider"
     batch_size = 1
+    # Size limits of one request, None for no limit.
+    max_characters = None
+    max_bytes = None
+    # Budgets of drt_translate_models, None for unlimited.
+    requests_per_second = None
+    characters_per_second = None
+    # Markup the provider leaves untranslated, ``{}`` being the number of a protected placeholder or tag. Texts are
+    # sent as HTML/XML then. None sends ``__TOKEN<n>__`` tokens in plain text.
+    span_markup = None
 
     @abstractmethod
     def translate_text(self, text: Union[str, Iterable[str]], source_language: str, target_language: str) -> Union[
         str, Iterable[str]]:
         pass
 
+    def is_throttled(self, error: Exception) -> bool:
+        """Whether ``error`` means that the provider rejected the request for going over its rate limit."""
+        return getattr(error, 'status_code', None) == 429 or getattr(error, 'code', None) == 429
+
+    def is_transient(self, error: Exception) -> bool:
+        """Whether the request that raised ``error`` may succeed when sent again."""
+        return self.is_throttled(error) or isinstance(error, (ConnectionError, TimeoutError))
+
+
+class AsyncTranslationProvider(ABC):
+    """
+    Mixin of providers usable from an event loop.
+
+    The default ``translate_text_async`` runs ``translate_text`` in the loop's default executor, providers with an
+    async SDK override it.
+    """
+
+    async def translate_text_async(self, text: Union[str, Iterable[str]], source_language: str,
+                                   target_language: str) -> Union[str, Iterable[str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.translate_text, text, source_language, target_language)
+
 
 class GoogleTranslateProvider(TranslationProvider):
     name = "google_v2"
     batch_size = 1
+    max_characters = 30000
+    span_markup = '<span translate="no">{}</span>'
 
     def __init__(self):
         self.client = translate_v2.Client()
 
     def translate_text(self, text, source_language, target_language):
-        result = self.client.translate(text, source_language=source_language, target_language=target_language)
+        result = self.client.translate(text, source_language=source_language, target_language=target_language,
+                                       format_='html')
         return result['translatedText']
 
+    def is_throttled(self, error):
+        return isinstance(error, (google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted))
+
+    def is_transient(self, error):
+        return self.is_throttled(error) or isinstance(error, google_exceptions.ServerError)
 
-class AWSTranslateProvider(TranslationProvider):
+
+class AWSTranslateProvider(TranslationProvider, AsyncTranslationProvider):
     name = "aws"
     batch_size = 1
+    max_bytes = 10000
 
     def __init__(self):
         if not (hasattr(settings, 'AWS_ACCESS_KEY_ID') and hasattr(settings, 'AWS_SECRET_ACCESS_KEY') and hasattr(
@@ -49,10 +93,22 @@ class AWSTranslateProvider(TranslationProvider):
                                               TargetLanguageCode=target_language)
         return response['TranslatedText']
 
+    def is_throttled(self, error):
+        return isinstance(error, botocore_exceptions.ClientError) and error.response.get('Error', {}).get(
+            'Code') in ('ThrottlingException', 'TooManyRequestsException')
+
+    def is_transient(self, error):
+        if isinstance(error, botocore_exceptions.ClientError):
+            return self.is_throttled(error) or error.response.get('Error', {}).get('Code') in (
+                'InternalServerException', 'ServiceUnavailableException')
+        return isinstance(error, (botocore_exceptions.ConnectionError, botocore_exceptions.ReadTimeoutError))
 
-class GoogleV3TranslateProvider(TranslationProvider):
+
+class GoogleV3TranslateProvider(TranslationProvider, AsyncTranslationProvider):
     name = "google_v3"
     batch_size = 50
+    max_characters = 30000
+    span_markup = '<span translate="no">{}</span>'
 
     def __init__(self):
         if not hasattr(settings, 'GOOGLE_CLOUD_PROJECT'):
@@ -60,32 +116,65 @@ class GoogleV3TranslateProvider(TranslationProvider):
         if not hasattr(settings, 'GOOGLE_CLOUD_LOCATION'):
             raise ValueError("GOOGLE_CLOUD_LOCATION must be set in settings")
         self.client = translate.TranslationServiceClient()
+        # Bound to the event loop it is created in, so created by the first async call.
+        self.async_client = None
+
+    async def translate_text_async(self, text, source_language, target_language):
+        if self.async_client is None:
+            self.async_client = translate.TranslationServiceAsyncClient()
+        results = await self.async_client.translate_text(
+            parent=f"projects/{settings.GOOGLE_CLOUD_PROJECT}/locations/{settings.GOOGLE_CLOUD_LOCATION}",
+            contents=text if isinstance(text, list) else [text],
+            source_language_code=source_language,
+            target_language_code=target_language,
+            mime_type='text/html'
+        )
+        translations = [result.translated_text for result in results.translations]
+        return translations if isinstance(text, list) else translations[0]
 
     def translate_text(self, text, source_language, target_language):
         parent = f"projects/{settings.GOOGLE_CLOUD_PROJECT}/locations/{settings.GOOGLE_CLOUD_LOCATION}"
         if isinstance(text, list):
             results = self.client.translate_text(parent=parent, contents=text, source_language_code=source_language,
-                                                 target_language_code=target_language)
+                                                 target_language_code=target_language, mime_type='text/html')
             return [result.translated_text for result in results.translations]
         else:
             results = self.client.translate_text(parent=parent, contents=[text], source_language_code=source_language,
-                                                 target_language_code=target_language)
+                                                 target_language_code=target_language, mime_type='text/html')
 
             return results.translations[0].translated_text
 
+    def is_throttled(self, error):
+        return isinstance(error, (google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted))
+
+    def is_transient(self, error):
+        return self.is_throttled(error) or isinstance(error, google_exceptions.ServerError)
 
-class DeeplTranslateProvider(TranslationProvider):
+
+class DeeplTranslateProvider(TranslationProvider, AsyncTranslationProvider):
     name = "deepl"
     batch_size = 50
+    # The request body is limited to 128 KiB, some of it goes to the other parameters.
+    max_bytes = 120 * 1024
+    # Contents of ignored tags are kept as they are.
+    span_markup = '<x>{}</x>'
 
     def __init__(self):
         if not hasattr(settings, 'DEEPL_AUTH_KEY'):
             raise ValueError("DEEPL_AUTH_KEY must be set in settings")
-        self.client = deepl.Translator(settings.DEEPL_AUTH_KEY)
+        self.client = deepl.Translator(settings.DEEPL_AUTH_KEY, server_url=getattr(settings, 'DEEPL_SERVER_URL', None))
 
     def translate_text(self, text, source_language, target_language):
-        results = self.client.translate_text(text, source_lang=source_language, target_lang=target_language)
+        results = self.client.translate_text(text, source_lang=source_language, target_lang=target_language,
+                                             tag_handling='xml', ignore_tags=['x'])
         if isinstance(text, list):
             return [result.text for result in results]
         else:
             return results.text
+
+    def is_throttled(self, error):
+        return isinstance(error, deepl.TooManyRequestsException)
+
+    def is_transient(self, error):
+        return isinstance(error, deepl.DeepLException) and (
+            self.is_throttled(error) or isinstance(error, deepl.ConnectionException) or error.should_retry)
@@ -1,53 +1,163 @@
 import os
-import re
+from collections import defaultdict
+
 from django.conf import settings
 from django.apps import apps
 from django.utils.translation import get_language
-from django_restful_translator.models import TranslatableModel, Translation
 
+from django_restful_translator import changes
+from django_restful_translator import jobs as translation_jobs
+from django_restful_translator import memory as translation_memory
+from django_restful_translator.models import TranslatableModel
+from django_restful_translator.placeholders import TOKEN_FORMAT, SpanProtector
+from django_restful_translator.storage import (
+    FETCH_CHUNK_SIZE,
+    get_storage,
+    group_by_storage,
+    iter_chunks,
+    load_instance,
+)
 
-def get_translation(instance, field_name, as_dict=False):
-    translations = list(instance.translations.all())
 
-    if as_dict:
-        return {trans.language: trans.field_value for trans in translations if trans.field_name == field_name}
-    else:
-        user_language = get_language()
-        if user_language != settings.LANGUAGE_CODE:
-            for trans in translations:
-                if trans.field_name == field_name and trans.language == user_language:
-                    return trans.field_value
-        return getattr(instance, field_name)
+plain_span_protector = SpanProtector()
 
 
-def fetch_translatable_fields(language):
-    models = apps.get_models()
-    translatable_models = [model for model in models if issubclass(model, TranslatableModel)]
+def get_translation_index(instance, languages, field_name):
+    """Return the translations of ``instance`` grouped as ``{field_name: {language: value}}``."""
+    return get_storage(type(instance)).get_index(instance, languages, field_name)
 
-    collected_translations = []
 
-    for model in translatable_models:
-        objects = model.objects.all().prefetch_related('translations')
-        for obj in objects:
-            for field_name in model.translatable_fields:
-                original_field_value = getattr(obj, field_name)
+def attach_translations(instances, languages, fields=None):
+    """Load the translations of ``instances`` in ``languages`` ahead of ``get_translation`` calls."""
+    for storage, storage_instances in group_by_storage(instances):
+        storage.attach(storage_instances, languages, fields)
 
-                if original_field_value is None or original_field_value == '':
-                    continue
 
-                trans = next((t for t in obj.translations.all() if
-                              t.field_name == field_name and t.language == language), None)
+def get_translation(instance, field_name, as_dict=False):
+    if as_dict:
+        languages = [lang_code for lang_code, lang_name in settings.LANGUAGES]
+        return dict(get_translation_index(instance, languages, field_name).get(field_name, {}))
+    else:
+        user_language = get_language()
+        if user_language != settings.LANGUAGE_CODE:
+            value = get_translation_index(instance, [user_language], field_name).get(field_name, {}).get(user_language)
+            if value is not None:
+                return value
+        return getattr(instance, field_name)
 
-                if not trans:
-                    trans = Translation(
-                        content_object=obj,
-                        field_name=field_name,
-                        language=language,
-                        field_value=original_field_value if language == settings.LANGUAGE_CODE else ""
-                    )
 
-                collected_translations.append(trans)
-    return collected_translations
+def save_translations(items, batch_size=None, created=False):
+    """
+    Insert or update translations in bulk.
+
+    ``items`` is an iterable of ``(instance, {(field_name, language): value})`` pairs. Values that didn't change
+    are skipped. ``created=True`` tells that the instances were just created, so there are no stored translations
+    to compare with. Returns the number of written values.
+    """
+    written = 0
+    for storage, storage_items in group_by_storage(items, key=lambda item: item[0]):
+        written += storage.save(storage_items, batch_size=batch_size, created=created)
+    return written
+
+
+class TranslationWriter:
+    """
+    Collect ``TranslationRecord`` objects and save them with ``save_translations``, ``batch_size`` at a time.
+
+    Meant to be the single writer of a command: workers hand their results over and only this object touches the
+    database.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.pending = []
+        self.pending_memory = []
+        self.pending_job_items = []
+        self.saved = 0
+
+    def add(self, records):
+        self.pending.extend(records)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_memory(self, entries):
+        """Queue ``TranslationMemory`` entries, saved with the next batch of translations."""
+        self.pending_memory.extend(entries)
+        if len(self.pending_memory) >= self.batch_size:
+            self.flush()
+
+    def add_job_items(self, items):
+        """
+        Queue finished ``TranslationJobItem`` objects, saved after the translations added before them so a job
+        resumed after a crash never skips an item whose translations weren't saved.
+        """
+        self.pending_job_items.extend(items)
+        if len(self.pending_job_items) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending_memory:
+            translation_memory.set_many(self.pending_memory, batch_size=self.batch_size)
+            self.pending_memory = []
+        if self.pending:
+            self.save_pending()
+        if self.pending_job_items:
+            translation_jobs.finish_items(self.pending_job_items, batch_size=self.batch_size)
+            self.pending_job_items = []
+
+    def save_pending(self):
+        values_by_object = defaultdict(dict)
+        sources_by_object = defaultdict(dict)
+        for record in self.pending:
+            values_by_object[(record.model, record.object_pk)][(record.field_name, record.language)] = \
+                record.field_value
+            sources_by_object[(record.model, record.object_pk)][record.field_name] = record.source_value
+        # Instances holding the source texts the values were translated from, whose hashes are saved along.
+        save_translations(
+            [(load_instance(model, object_pk, sources_by_object[(model, object_pk)]), values)
+             for (model, object_pk), values in values_by_object.items()],
+            batch_size=self.batch_size
+        )
+        self.saved += len(self.pending)
+        self.pending = []
+
+
+def get_translatable_models():
+    return [model for model in apps.get_models() if issubclass(model, TranslatableModel)]
+
+
+def fetch_translatable_fields(language, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Yield a ``TranslationRecord`` per non-empty translatable field of every object, streamed ``chunk_size``
+    objects at a time. With a list of languages, the objects are read once and yield a record per language.
+    """
+    for model in get_translatable_models():
+        yield from get_storage(model).fetch(model, language, chunk_size=chunk_size)
+
+
+def fetch_missing_translations(language, chunk_size=FETCH_CHUNK_SIZE):
+    """Like ``fetch_translatable_fields``, limited to the fields with no translation (or an empty one)."""
+    for model in get_translatable_models():
+        yield from get_storage(model).fetch_missing(model, language, chunk_size=chunk_size)
+
+
+def fetch_stale_translations(language, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Like ``fetch_missing_translations``, limited to the translations made from another source text than the
+    current one. Models whose storage doesn't track source texts are skipped.
+    """
+    for model in get_translatable_models():
+        storage = get_storage(model)
+        if storage.tracks_source_hash:
+            yield from storage.fetch_stale(model, language, chunk_size=chunk_size)
+
+
+def get_changed_objects(model, language, since):
+    """
+    Primary keys of the ``model`` objects saved, deleted, or with a translation in ``language`` written since
+    ``since``. Saved and deleted objects are only known with ``DRT_TRACK_CHANGES``.
+    """
+    return changes.get_changed_objects(model, since) | get_storage(model).changed_objects(model, language, since)
 
 
 def get_po_file_path(language):
@@ -65,23 +175,15 @@ def get_po_metadata():
 
 
 def replace_placeholders_with_tokens(text):
-    placeholders = re.findall(r'\{.*?\}', text)
-    tokens = {}
-    counter = 1
-    for placeholder in placeholders:
-        token = f"__TOKEN{counter}__"
-        counter += 1
-        tokens[token] = placeholder
-        text = text.replace(placeholder, token)
-    return text, tokens
+    """Replace the placeholders and markup of ``text`` by ``__TOKEN<n>__``, returning ``{token: placeholder}``."""
+    text, spans = plain_span_protector.protect(text)
+    return text, {TOKEN_FORMAT.format(number): span for number, span in enumerate(spans, 1)}
 
 
 def replace_tokens_with_placeholders(text, tokens):
-    for token, placeholder in tokens.items():
-        text = text.replace(token, placeholder)
-    return text
+    return plain_span_protector.restore(text, list(tokens.values()))
 
 
 def get_batches(data, batch_size):
-    for i in range(0, len(data), batch_size):
-        yield data[i:i + batch_size]
+    """Split any iterable, generators included, into lists of ``batch_size`` items."""
+    return iter_chunks(data, batch_size)
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('example_app', '0002_examplejsonmodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExampleTableModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=50, null=True)),
+                ('description', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ExampleTableModelTranslation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(choices=[('en', 'English'), ('es', 'Spanish')], max_length=10)),
+                ('field_name', models.CharField(max_length=64)),
+                ('field_value', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('master', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='model_translations', to='example_app.exampletablemodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['language', 'updated_at'], name='example_app_languag_44e740_idx')],
+                'unique_together': {('master', 'language', 'field_name')},
+            },
+        ),
+    ]
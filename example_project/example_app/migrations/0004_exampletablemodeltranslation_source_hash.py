@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('example_app', '0003_exampletablemodel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exampletablemodeltranslation',
+            name='source_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django_restful_translator.models import TranslatableModel
+from django_restful_translator.storage import JSONTranslationStorage, TableTranslationStorage
 
 
 class ExampleModel(TranslatableModel):
@@ -7,3 +8,19 @@ class ExampleModel(TranslatableModel):
     description = models.TextField(null=True, blank=True)
 
     translatable_fields = ['name', 'description']
+
+
+class ExampleJSONModel(TranslatableModel):
+    name = models.CharField(max_length=50, null=True, blank=True)
+    translation_values = models.JSONField(default=dict, blank=True)
+
+    translatable_fields = ['name']
+    translation_storage = JSONTranslationStorage('translation_values')
+
+
+class ExampleTableModel(TranslatableModel):
+    name = models.CharField(max_length=50, null=True, blank=True)
+    description = models.TextField(null=True, blank=True)
+
+    translatable_fields = ['name', 'description']
+    translation_storage = TableTranslationStorage()
@@ -3,7 +3,7 @@ from rest_framework import serializers
 from django_restful_translator.drf.fields import AutoTranslatableJsonField
 from django_restful_translator.drf.serializers import TranslatableDBSerializer, TranslatableDBDictSerializer, \
     TranslatableGettextSerializer, TranslatableGettextDictSerializer, TranslatableWritableDBDictSerializer
-from .models import ExampleModel
+from .models import ExampleJSONModel, ExampleModel, ExampleTableModel
 
 
 class ExampleModelBaseSerializer(serializers.ModelSerializer):
@@ -31,3 +31,27 @@ class ExampleModelTranslatableGettextSerializer(ExampleModelBaseSerializer, Tran
 
 class ExampleModelTranslatableGettextDictSerializer(ExampleModelBaseSerializer, TranslatableGettextDictSerializer):
     pass
+
+
+class ExampleJSONModelTranslatableWritableDBDictSerializer(TranslatableWritableDBDictSerializer):
+    class Meta:
+        model = ExampleJSONModel
+        fields = ('id', 'name')
+
+
+class ExampleJSONModelTranslatableDBSerializer(TranslatableDBSerializer):
+    class Meta:
+        model = ExampleJSONModel
+        fields = ('id', 'name')
+
+
+class ExampleTableModelTranslatableWritableDBDictSerializer(TranslatableWritableDBDictSerializer):
+    class Meta:
+        model = ExampleTableModel
+        fields = ('id', 'name', 'description')
+
+
+class ExampleTableModelTranslatableDBSerializer(TranslatableDBSerializer):
+    class Meta:
+        model = ExampleTableModel
+        fields = ('id', 'name', 'description')
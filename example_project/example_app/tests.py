@@ -1,7 +1,70 @@
+import asyncio
+import heapq
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+import polib
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import translation
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from django_restful_translator.batching import BatchLimits, iter_requests, join_texts, pack_batches, split_texts
+from django_restful_translator.catalog import catalog
+from django_restful_translator.drf.fields import GetTextCharField, GetTextListField
+from django_restful_translator.drf.serializers import TranslatableListSerializer
+from django_restful_translator.management.commands.drt_translate_models import Command as TranslateModelsCommand
+from django_restful_translator.memory import make_key as make_memory_key
+from django_restful_translator.models import (
+    PREFETCHED_TRANSLATIONS_ATTR,
+    TranslatableObjectChange,
+    Translation,
+    TranslationJob,
+    TranslationJobItem,
+    TranslationMemory,
+)
+from django_restful_translator.placeholders import SpanProtector
+from django_restful_translator.po import POBuilder, get_watermark, write_po_file
+from django_restful_translator.rate_limit import ProviderScheduler, TokenBucket
+from django_restful_translator.storage import get_storage, hash_source
+from django_restful_translator.translation_providers import (
+    AsyncTranslationProvider,
+    DeeplTranslateProvider,
+    GoogleTranslateProvider,
+    TranslationProvider,
+)
+from django_restful_translator.utils import (
+    fetch_missing_translations,
+    fetch_stale_translations,
+    fetch_translatable_fields,
+    get_translation,
+    replace_placeholders_with_tokens,
+    replace_tokens_with_placeholders,
+    save_translations,
+)
+from .models import ExampleJSONModel, ExampleModel, ExampleTableModel
+from .serializers import (
+    ExampleJSONModelTranslatableDBSerializer,
+    ExampleJSONModelTranslatableWritableDBDictSerializer,
+    ExampleModelTranslatableDBDictSerializer,
+    ExampleModelTranslatableWritableDBDictSerializer,
+    ExampleTableModelTranslatableDBSerializer,
+    ExampleTableModelTranslatableWritableDBDictSerializer,
+)
+
 
 class ExampleModelAPITests(APITestCase):
     fixtures = ['example_project/initial_data.json']
@@ -71,3 +134,1008 @@ class ExampleModelAPITests(APITestCase):
         response = self.client.put(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertDictEqual(response.data['name'], {'en': 'Hello', 'es': 'Adiós'})
+
+
+class TranslationPrefetchTests(TestCase):
+    fixtures = ['example_project/initial_data.json']
+
+    def test_with_translations_scopes_rows_to_language(self):
+        objects = list(ExampleModel.objects.with_translations('es', fields=['name']).order_by('pk'))
+        with self.assertNumQueries(0):
+            with translation.override('es'):
+                self.assertEqual(get_translation(objects[0], 'name'), 'Hola')
+        self.assertEqual([trans.field_name for trans in getattr(objects[0], PREFETCHED_TRANSLATIONS_ATTR)], ['name'])
+
+    def test_out_of_scope_lookup_falls_back_to_relation(self):
+        obj = ExampleModel.objects.with_translations('es', fields=['name']).get(pk=1)
+        with self.assertNumQueries(1):
+            self.assertDictEqual(get_translation(obj, 'description', as_dict=True), {'es': 'Esta es una descripción'})
+
+    def test_db_list_endpoint_prefetches_active_language(self):
+        url = reverse('example_app:translatable_db')
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_ACCEPT_LANGUAGE='es')
+        self.assertEqual(response.data[1]['name'], "Mundo")
+
+    def test_list_serializer_loads_page_translations_at_once(self):
+        objects = list(ExampleModel.objects.order_by('pk'))
+        with self.assertNumQueries(1):
+            data = ExampleModelTranslatableDBDictSerializer(objects, many=True).data
+        self.assertDictEqual(data[1]['name'], {'en': 'World', 'es': 'Mundo'})
+        self.assertIsInstance(ExampleModelTranslatableDBDictSerializer(many=True), TranslatableListSerializer)
+
+
+class TranslationIndexTests(TestCase):
+    fixtures = ['example_project/initial_data.json']
+
+    def test_index_is_built_once_per_instance(self):
+        obj = ExampleModel.objects.get(pk=1)
+        with self.assertNumQueries(1):
+            self.assertDictEqual(get_translation(obj, 'name', as_dict=True), {'es': 'Hola'})
+            self.assertDictEqual(get_translation(obj, 'description', as_dict=True), {'es': 'Esta es una descripción'})
+            with translation.override('es'):
+                self.assertEqual(get_translation(obj, 'name'), 'Hola')
+
+    def test_index_is_invalidated_on_write(self):
+        obj = ExampleModel.objects.get(pk=1)
+        get_translation(obj, 'name', as_dict=True)
+        serializer = ExampleModelTranslatableWritableDBDictSerializer(obj, data={'name': {'es': 'Buenas'}})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertDictEqual(get_translation(obj, 'name', as_dict=True), {'es': 'Buenas'})
+
+
+@override_settings(
+    DRT_CACHE_ALIAS='default',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'drt-tests'}},
+)
+class TranslationCacheTests(TestCase):
+    fixtures = ['example_project/initial_data.json']
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_list_is_served_from_cache(self):
+        url = reverse('example_app:translatable_db_dict')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertDictEqual(response.data[0]['name'], {"en": "Hello", "es": "Hola"})
+
+    def test_translation_save_invalidates_cache(self):
+        get_translation(ExampleModel.objects.get(pk=1), 'name', as_dict=True)
+        Translation.objects.filter(object_id='1', field_name='name').update(field_value='Buenas')
+        Translation.objects.get(object_id='1', field_name='description').save()
+        self.assertDictEqual(get_translation(ExampleModel.objects.get(pk=1), 'name', as_dict=True), {'es': 'Buenas'})
+
+    def test_warm_cache_command(self):
+        call_command('drt_warm_cache', stdout=StringIO())
+        obj = ExampleModel.objects.get(pk=2)
+        with self.assertNumQueries(0):
+            self.assertDictEqual(get_translation(obj, 'name', as_dict=True), {'es': 'Mundo'})
+
+
+class TypedObjectKeyTests(TestCase):
+    fixtures = ['example_project/initial_data.json']
+
+    def test_save_fills_typed_key(self):
+        trans = Translation.objects.get(pk=1)
+        trans.save()
+        self.assertEqual(trans.object_int_id, 1)
+        self.assertIsNone(trans.object_uuid)
+
+    @override_settings(DRT_TYPED_OBJECT_KEY=True)
+    def test_lookups_use_typed_key_after_backfill(self):
+        call_command('drt_backfill_object_keys', stdout=StringIO())
+        self.assertFalse(Translation.objects.filter(object_int_id__isnull=True).exists())
+        objects = list(ExampleModel.objects.order_by('pk'))
+        with CaptureQueriesContext(connection) as queries:
+            data = ExampleModelTranslatableDBDictSerializer(objects, many=True).data
+        self.assertIn('object_int_id', queries[0]['sql'])
+        self.assertDictEqual(data[0]['name'], {'en': 'Hello', 'es': 'Hola'})
+
+
+class TranslatedQueryTests(APITestCase):
+    fixtures = ['example_project/initial_data.json']
+
+    def setUp(self):
+        obj = ExampleModel.objects.create(name='Apple', description='')
+        obj.translations.create(language='es', field_name='name', field_value='Zeta')
+        obj.translations.create(language='es', field_name='description', field_value='')
+
+    def test_annotate_translated_falls_back_to_source(self):
+        values = ExampleModel.objects.annotate_translated('es').order_by('pk').values_list(
+            'name_es', 'description_es')
+        self.assertEqual(list(values), [
+            ('Hola', 'Esta es una descripción'), ('Mundo', 'Another description'), ('Zeta', ''),
+        ])
+
+    def test_ordering_by_translated_value(self):
+        url = reverse('example_app:translatable_db_filtered')
+        response = self.client.get(url, {'ordering': 'name'}, HTTP_ACCEPT_LANGUAGE='es')
+        self.assertEqual([item['name'] for item in response.data], ['Hola', 'Mundo', 'Zeta'])
+        response = self.client.get(url, {'ordering': 'name'}, HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual([item['name'] for item in response.data], ['Apple', 'Hello', 'World'])
+
+    def test_search_by_translated_value(self):
+        url = reverse('example_app:translatable_db_filtered')
+        response = self.client.get(url, {'search': 'mund'}, HTTP_ACCEPT_LANGUAGE='es')
+        self.assertEqual([item['id'] for item in response.data], [2])
+        response = self.client.get(url, {'search': 'mund'}, HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(response.data, [])
+
+
+class GettextCatalogTests(TestCase):
+    def test_gettext_all_does_not_activate_languages(self):
+        with translation.override('en'):
+            self.assertDictEqual(catalog.gettext_all('Hello'), {'en': 'Hello', 'es': 'Hola'})
+            self.assertEqual(translation.get_language(), 'en')
+
+    def test_fields_use_active_language(self):
+        with translation.override('es'):
+            self.assertEqual(GetTextCharField().to_representation('World'), 'Mundo')
+            self.assertEqual(GetTextListField().to_representation(['Hello', 'Not in the catalog']),
+                             ['Hola', 'Not in the catalog'])
+
+
+class SaveTranslationsTests(TestCase):
+    fixtures = ['example_project/initial_data.json']
+
+    def test_unchanged_values_are_skipped(self):
+        obj = ExampleModel.objects.get(pk=1)
+        written = save_translations([(obj, {('name', 'es'): 'Hola', ('description', 'es'): 'Otra'})])
+        self.assertEqual(written, 1)
+        self.assertEqual(Translation.objects.get(object_id='1', field_name='description').field_value, 'Otra')
+
+    def test_writable_serializer_upserts_in_constant_queries(self):
+        obj = ExampleModel.objects.get(pk=2)
+        serializer = ExampleModelTranslatableWritableDBDictSerializer(obj, data={
+            'name': {'en': 'Earth', 'es': 'Tierra'},
+            'description': {'es': 'Otra descripción'},
+        })
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+        # parent update, existing rows, upsert
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 3)
+        self.assertDictEqual(get_translation(obj, 'name', as_dict=True), {'es': 'Tierra'})
+        self.assertEqual(obj.name, 'Earth')
+
+    def test_fallback_without_conflict_support(self):
+        obj = ExampleModel.objects.get(pk=2)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            save_translations([(obj, {('name', 'es'): 'Tierra', ('description', 'es'): 'Otra'})])
+        self.assertDictEqual(
+            dict(Translation.objects.filter(object_id='2').values_list('field_name', 'field_value')),
+            {'name': 'Tierra', 'description': 'Otra'}
+        )
+
+    def test_many_create_uses_bulk_queries(self):
+        serializer = ExampleModelTranslatableWritableDBDictSerializer(data=[
+            {'name': {'en': f'Item {number}', 'es': f'Artículo {number}'}, 'description': {'es': 'Descripción'}}
+            # 80 translation rows, within the SQLite limit of 999 parameters of a single insert
+            for number in range(40)
+        ], many=True)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            instances = serializer.save()
+        # parent insert, translations insert
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 2)
+        self.assertEqual(len(instances), 40)
+        self.assertDictEqual(get_translation(instances[7], 'name', as_dict=True), {'es': 'Artículo 7'})
+        self.assertEqual(serializer.data[7]['name'], {'en': 'Item 7', 'es': 'Artículo 7'})
+
+
+class JSONTranslationStorageTests(TestCase):
+    def setUp(self):
+        self.obj = ExampleJSONModel.objects.create(name='Hello', translation_values={'name': {'es': 'Hola'}})
+
+    def test_reads_need_no_query(self):
+        objects = list(ExampleJSONModel.objects.all())
+        with self.assertNumQueries(0), translation.override('es'):
+            data = ExampleJSONModelTranslatableDBSerializer(objects, many=True).data
+        self.assertEqual(data[0]['name'], 'Hola')
+
+    def test_writable_serializer_merges_values(self):
+        serializer = ExampleJSONModelTranslatableWritableDBDictSerializer(self.obj, data={'name': {'es': 'Buenas'}})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.obj.refresh_from_db()
+        self.assertDictEqual(self.obj.translation_values, {'name': {'es': 'Buenas'}})
+        self.assertEqual(Translation.objects.count(), 0)
+
+    def test_annotate_translated(self):
+        ExampleJSONModel.objects.create(name='World')
+        values = ExampleJSONModel.objects.annotate_translated('es').order_by('pk').values_list('name_es', flat=True)
+        self.assertEqual(list(values), ['Hola', 'World'])
+
+    def test_fetch_translatable_fields_and_record_save(self):
+        records = [record for record in fetch_translatable_fields('es') if record.object_pk == self.obj.pk
+                   and record.model is ExampleJSONModel]
+        self.assertEqual([(record.field_name, record.field_value) for record in records], [('name', 'Hola')])
+        records[0].field_value = 'Saludos'
+        records[0].save()
+        self.obj.refresh_from_db()
+        self.assertEqual(self.obj.translation_values['name']['es'], 'Saludos')
+
+
+class TableTranslationStorageTests(TestCase):
+    def setUp(self):
+        self.storage = ExampleTableModel.translation_storage
+        self.obj = ExampleTableModel.objects.create(name='Hello', description='World')
+        save_translations([(self.obj, {('name', 'es'): 'Hola'})])
+
+    def test_generated_translation_model(self):
+        translation_model = self.storage.translation_model
+        self.assertEqual(translation_model.__name__, 'ExampleTableModelTranslation')
+        self.assertEqual(translation_model._meta.app_label, 'example_app')
+        self.assertEqual(translation_model._meta.get_field('master').related_model, ExampleTableModel)
+        self.assertEqual(translation_model.objects.get().field_value, 'Hola')
+        self.assertEqual(Translation.objects.count(), 0)
+
+    def test_list_reads_translations_in_one_query(self):
+        ExampleTableModel.objects.create(name='Bye')
+        with self.assertNumQueries(2), translation.override('es'):
+            data = ExampleTableModelTranslatableDBSerializer(ExampleTableModel.objects.order_by('pk'), many=True).data
+        self.assertEqual([item['name'] for item in data], ['Hola', 'Bye'])
+
+    def test_writable_serializer_updates_rows(self):
+        serializer = ExampleTableModelTranslatableWritableDBDictSerializer(
+            self.obj, data={'name': {'es': 'Buenas'}, 'description': {'es': 'Mundo'}})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertDictEqual(get_translation(self.obj, 'name', as_dict=True), {'es': 'Buenas'})
+        self.assertEqual(self.storage.translation_model.objects.count(), 2)
+
+    def test_annotate_translated(self):
+        values = ExampleTableModel.objects.annotate_translated('es').values_list('name_es', 'description_es')
+        self.assertEqual(list(values), [('Hola', 'World')])
+
+    def test_fetch_translatable_fields(self):
+        records = {record.field_name: record for record in fetch_translatable_fields('es')
+                   if record.model is ExampleTableModel}
+        self.assertEqual(records['name'].field_value, 'Hola')
+        self.assertEqual(records['description'].field_value, '')
+        records['description'].field_value = 'Mundo'
+        records['description'].save()
+        self.assertEqual(get_translation(self.obj, 'description', as_dict=True), {'es': 'Mundo'})
+
+    def test_migrate_storage_command(self):
+        call_command('drt_migrate_storage', 'example_app.ExampleTableModel', '--to_generic', '--delete_source',
+                     stdout=StringIO())
+        self.assertFalse(self.storage.translation_model.objects.exists())
+        self.assertEqual(Translation.objects.get(object_id=str(self.obj.pk)).field_value, 'Hola')
+
+        call_command('drt_migrate_storage', '--delete_source', '--chunk_size', '1', stdout=StringIO())
+        self.assertFalse(Translation.objects.exists())
+        self.assertEqual(self.storage.translation_model.objects.get().field_value, 'Hola')
+
+
+class FetchTranslatableFieldsTests(TestCase):
+    def setUp(self):
+        objects = ExampleModel.objects.bulk_create([ExampleModel(name=f'Name {i}', description='') for i in range(5)])
+        save_translations([(obj, {('name', 'es'): f'Nombre {obj.pk}', ('name', 'en'): 'Other'}) for obj in objects])
+        self.objects = objects
+
+    def test_streams_chunks_of_objects(self):
+        with self.assertNumQueries(0):
+            records = fetch_translatable_fields('es', chunk_size=2)
+        with self.assertNumQueries(2):
+            first = next(records)
+        self.assertEqual((first.language, first.field_value), ('es', f'Nombre {first.object_pk}'))
+        # Two more chunks with their translations, the empty last chunk and the (empty) other models.
+        with self.assertNumQueries(7):
+            remaining = list(records)
+        self.assertEqual(len(remaining), 4)
+        self.assertTrue(all(record.field_value == f'Nombre {record.object_pk}' for record in remaining))
+
+    def test_records_only_hold_the_source_value(self):
+        record = next(fetch_translatable_fields('es'))
+        self.assertEqual(record.model, ExampleModel)
+        self.assertEqual(record.source_value, 'Name 0')
+        self.assertFalse(hasattr(record, '__dict__'))
+
+
+class StubTranslationProvider(TranslationProvider, AsyncTranslationProvider):
+    name = 'stub'
+    batch_size = 10
+
+    sent = []
+
+    def translate_text(self, text, source_language, target_language):
+        self.sent.extend([text] if isinstance(text, str) else text)
+        if isinstance(text, str):
+            return f'{target_language}:{text}'
+        return [f'{target_language}:{item}' for item in text]
+
+
+class MissingTranslationsTests(TestCase):
+    def setUp(self):
+        self.translated = ExampleModel.objects.create(name='Translated', description='')
+        self.emptied = ExampleModel.objects.create(name='Emptied', description='Text')
+        self.untranslated = ExampleModel.objects.create(name='Untranslated', description=None)
+        save_translations([
+            (self.translated, {('name', 'es'): 'Traducido'}),
+            (self.emptied, {('name', 'es'): '', ('description', 'en'): 'Text'}),
+        ])
+
+    def test_only_missing_translations_are_fetched(self):
+        records = [record for record in fetch_missing_translations('es') if record.model is ExampleModel]
+        self.assertEqual(
+            sorted((record.object_pk, record.field_name, record.source_value) for record in records),
+            [(self.emptied.pk, 'description', 'Text'), (self.emptied.pk, 'name', 'Emptied'),
+             (self.untranslated.pk, 'name', 'Untranslated')]
+        )
+
+    def test_each_field_is_one_anti_join_per_chunk(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(get_storage(ExampleModel).fetch_missing(ExampleModel, 'es'))
+        # A chunk and the empty query ending the pagination, for both fields.
+        self.assertEqual(len(queries), 4)
+        self.assertIn('NOT EXISTS', queries[0]['sql'])
+
+    def test_other_storages(self):
+        ExampleJSONModel.objects.create(name='Hello', translation_values={'name': {'es': 'Hola'}})
+        json_missing = ExampleJSONModel.objects.create(name='Bye', translation_values={'name': {'es': ''}})
+        table_obj = ExampleTableModel.objects.create(name='Hello', description='World')
+        save_translations([(table_obj, {('name', 'es'): 'Hola'})])
+        records = {
+            (record.model, record.object_pk, record.field_name)
+            for record in fetch_missing_translations('es') if record.model is not ExampleModel
+        }
+        self.assertSetEqual(records, {(ExampleJSONModel, json_missing.pk, 'name'),
+                                      (ExampleTableModel, table_obj.pk, 'description')})
+
+    def test_translate_models_command_translates_missing_fields(self):
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='stub', stdout=out)
+        self.assertEqual(get_translation(self.emptied, 'name', as_dict=True)['es'], 'es:Emptied')
+        self.assertEqual(get_translation(self.translated, 'name', as_dict=True)['es'], 'Traducido')
+        self.assertEqual(out.getvalue().strip().splitlines()[-1],
+                         'Translated 3 fields, reused 0, saved 3, failed 0, retried 0 batches')
+
+    def test_translate_models_command_saves_in_batches(self):
+        with mock.patch('django_restful_translator.utils.save_translations', wraps=save_translations) as save:
+            call_command('drt_translate_models', language='es', provider='stub', without_batch=True, workers=1,
+                         save_batch_size=2, stdout=StringIO())
+        # A full batch of 2 fields, then the last field when the run ends.
+        self.assertEqual(save.call_count, 2)
+        self.assertEqual(get_translation(self.untranslated, 'name', as_dict=True)['es'], 'es:Untranslated')
+
+
+class TranslationMemoryTests(TestCase):
+    def setUp(self):
+        StubTranslationProvider.sent = []
+        ExampleModel.objects.bulk_create([ExampleModel(name='Add to cart', description='Red') for i in range(3)])
+
+    def test_identical_texts_are_sent_once(self):
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='stub', stdout=out)
+        self.assertCountEqual(StubTranslationProvider.sent, ['Add to cart', 'Red'])
+        self.assertEqual(out.getvalue().strip().splitlines()[-1],
+                         'Translated 2 fields, reused 4, saved 6, failed 0, retried 0 batches')
+        self.assertEqual(Translation.objects.filter(language='es', field_value='es:Add to cart').count(), 3)
+        self.assertEqual(TranslationMemory.objects.count(), 2)
+
+    def test_memory_is_reused_by_later_runs(self):
+        call_command('drt_translate_models', language='es', provider='stub', stdout=StringIO())
+        ExampleModel.objects.create(name='Add to cart')
+        StubTranslationProvider.sent = []
+        call_command('drt_translate_models', language='es', provider='stub', stdout=StringIO())
+        self.assertEqual(StubTranslationProvider.sent, [])
+        self.assertEqual(Translation.objects.filter(language='es', field_value='es:Add to cart').count(), 4)
+
+        Translation.objects.all().delete()
+        call_command('drt_translate_models', language='es', provider='stub', without_memory=True, stdout=StringIO())
+        self.assertCountEqual(StubTranslationProvider.sent, ['Add to cart', 'Red'])
+
+    def test_memory_key_depends_on_languages_and_provider(self):
+        key = make_memory_key('Red', 'en', 'es', 'stub')
+        self.assertEqual(key, make_memory_key('Red', 'en', 'es', 'stub'))
+        self.assertNotEqual(key, make_memory_key('Red', 'en', 'fr', 'stub'))
+        self.assertNotEqual(key, make_memory_key('Red', 'en', 'es', 'deepl'))
+
+
+class StubDeepLHandler(BaseHTTPRequestHandler):
+    """Answers DeepL ``/v2/translate`` requests with the texts upper-cased."""
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.requests.append(body)
+        response = json.dumps({'translations': [
+            {'detected_source_language': 'EN', 'text': text.upper(), 'billed_characters': len(text)}
+            for text in body['text']
+        ]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AsyncProviderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubDeepLHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubDeepLHandler.requests = []
+        server_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.settings_override = override_settings(DEEPL_AUTH_KEY='test:fx', DEEPL_SERVER_URL=server_url)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_thread_offloaded_provider(self):
+        provider = DeeplTranslateProvider()
+        translated = asyncio.run(provider.translate_text_async(['Hello', 'World'], 'en', 'es'))
+        self.assertEqual(translated, ['HELLO', 'WORLD'])
+        self.assertEqual(StubDeepLHandler.requests[0]['target_lang'], 'ES')
+
+    def test_async_command(self):
+        objects = ExampleModel.objects.bulk_create([ExampleModel(name=f'Name {i}') for i in range(120)])
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='deepl', use_async=True, concurrency=8,
+                     stdout=out)
+        self.assertEqual(out.getvalue().strip().splitlines()[-1],
+                         'Translated 120 fields, reused 0, saved 120, failed 0, retried 0 batches')
+        self.assertEqual(len(StubDeepLHandler.requests), 3)
+        self.assertEqual(get_translation(objects[-1], 'name', as_dict=True)['es'], 'NAME 119')
+
+    def test_async_requires_an_async_provider(self):
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='google_v2', use_async=True, stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Provider google_v2 does not support --async')
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+class FlakyTranslationProvider(TranslationProvider):
+    """Raises the queued ``failures`` before translating like ``StubTranslationProvider``."""
+    name = 'flaky'
+    batch_size = 10
+    failures = []
+
+    def translate_text(self, text, source_language, target_language):
+        if self.failures:
+            raise self.failures.pop(0)
+        return StubTranslationProvider().translate_text(text, source_language, target_language)
+
+
+class RateLimitTests(TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=10)
+        self.assertEqual(bucket.reserve(10), 0)
+        self.assertAlmostEqual(bucket.reserve(5), 0.5, places=1)
+
+    def test_scheduler_budgets_and_concurrency(self):
+        scheduler = ProviderScheduler(8, requests_per_second=100, characters_per_second=1000)
+        self.assertEqual(scheduler.reserve(500), 0)
+        # 500 characters are left from the first second.
+        self.assertAlmostEqual(scheduler.reserve(1000), 0.5, places=1)
+        scheduler.record_throttle()
+        scheduler.record_throttle()
+        self.assertEqual(scheduler.concurrency, 2)
+        for i in range(2):
+            scheduler.record_success()
+        self.assertEqual(scheduler.concurrency, 3)
+        self.assertLessEqual(scheduler.get_backoff(3), 8)
+
+
+@mock.patch.object(ProviderScheduler, 'get_backoff', return_value=0)
+class ProviderRetryTests(TestCase):
+    def setUp(self):
+        self.obj = ExampleModel.objects.create(name='Hello')
+
+    def test_throttled_batches_are_requeued(self, get_backoff):
+        FlakyTranslationProvider.failures = [ThrottledError(), ConnectionError()]
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='flaky', stdout=out)
+        self.assertEqual(out.getvalue().strip().splitlines()[-1],
+                         'Translated 1 fields, reused 0, saved 1, failed 0, retried 2 batches')
+        self.assertEqual(get_translation(self.obj, 'name', as_dict=True)['es'], 'es:Hello')
+
+    def test_other_errors_and_exhausted_retries_fail(self, get_backoff):
+        FlakyTranslationProvider.failures = [ThrottledError(), ThrottledError()]
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='flaky', max_retries=1, stdout=out)
+        self.assertEqual(out.getvalue().strip().splitlines()[-1],
+                         'Translated 0 fields, reused 0, saved 0, failed 1, retried 1 batches')
+
+        FlakyTranslationProvider.failures = [ValueError('Bad request')]
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='flaky', stdout=out)
+        self.assertIn('Error occurred: Bad request', out.getvalue())
+        self.assertFalse(Translation.objects.filter(language='es').exists())
+
+    def test_due_retries_wait_for_a_free_slot(self, get_backoff):
+        command = TranslateModelsCommand()
+        command.scheduler = ProviderScheduler(2)
+
+        def collect_results(done, futures, writer, provider):
+            for future in done:
+                batch, attempt, item = futures.pop(future)
+                if batch == 'throttled' and not attempt:
+                    # Concurrency drops to 1 while the slow request is still in flight.
+                    command.scheduler.record_throttle()
+                    heapq.heappush(command.retry_queue, (0, 0, batch, 1, item))
+
+        command.collect_results = collect_results
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            def submit(batch):
+                return executor.submit(time.sleep, 0.3 if batch == 'slow' else 0)
+
+            with mock.patch('django_restful_translator.management.commands.drt_translate_models.wait',
+                            wraps=wait) as wait_mock:
+                command.run_tasks([('throttled', None), ('slow', None)], submit, None, None)
+        self.assertLess(wait_mock.call_count, 10)
+
+
+class BatchingTests(TestCase):
+    def test_batches_respect_every_limit(self):
+        limits = BatchLimits(max_items=3, max_characters=10, max_bytes=12)
+        texts = ['aaaaaaa', 'b', 'cc', 'ddddd', 'é' * 4, 'f', 'g', 'hhhhhhhhhhhhhhh']
+        batches = list(pack_batches(texts, limits))
+        self.assertCountEqual([text for batch in batches for text in batch], texts)
+        for batch in batches[1:]:
+            self.assertTrue(limits.fits(len(batch), sum(map(len, batch)), len(''.join(batch).encode())))
+        # The oversized text goes alone, the short ones fill the space left by the long ones.
+        self.assertEqual(batches[0], ['hhhhhhhhhhhhhhh'])
+        self.assertEqual(batches[1], ['aaaaaaa', 'cc', 'b'])
+        self.assertEqual(len(batches), 4)
+
+    def test_long_texts_are_split_at_sentence_boundaries(self):
+        limits = BatchLimits(max_items=2, max_characters=20, max_bytes=None)
+        texts = ['First sentence. Second one! And a third?', 'Short', 'x' * 45]
+        pieces, layout = split_texts(texts, limits)
+        self.assertEqual(pieces[:3], ['First sentence.', 'Second one!', 'And a third?'])
+        self.assertTrue(all(len(piece) <= 20 for piece in pieces))
+        self.assertTrue(all(len(request) <= 2 for request in iter_requests(pieces, limits)))
+        self.assertEqual(join_texts(pieces, layout), texts)
+
+    def test_long_texts_are_not_split_inside_protected_spans(self):
+        protector = SpanProtector(GoogleTranslateProvider.span_markup)
+        limits = BatchLimits(max_items=None, max_characters=60, max_bytes=None)
+        source = 'Hello {a} ' * 12
+        text, spans = protector.protect(source)
+        pieces, layout = split_texts([text], limits, protector.token_pattern)
+        self.assertGreater(len(pieces), 1)
+        self.assertTrue(all(len(piece) <= 60 for piece in pieces))
+        for piece in pieces:
+            self.assertEqual(piece.count('<span translate="no">'), len(protector.token_pattern.findall(piece)))
+            self.assertEqual(piece.count('</span>'), len(protector.token_pattern.findall(piece)))
+        self.assertEqual(protector.restore(join_texts(pieces, layout)[0], spans), source)
+        # Texts without whitespace are cut anywhere but inside a span.
+        pieces, layout = split_texts(['x' * 50 + '<span translate="no">1</span>'], limits, protector.token_pattern)
+        self.assertEqual(pieces, ['x' * 50, '<span translate="no">1</span>'])
+
+    def test_translate_models_command_splits_long_texts(self):
+        obj = ExampleModel.objects.create(name='Short', description='One sentence. Another sentence.')
+        StubTranslationProvider.sent = []
+        with mock.patch.object(StubTranslationProvider, 'max_characters', 20):
+            call_command('drt_translate_models', language='es', provider='stub', stdout=StringIO())
+        self.assertCountEqual(StubTranslationProvider.sent, ['Short', 'One sentence.', 'Another sentence.'])
+        self.assertEqual(get_translation(obj, 'description', as_dict=True)['es'],
+                         'es:One sentence. es:Another sentence.')
+
+
+@override_settings(LANGUAGES=(('en', 'English'), ('es', 'Spanish'), ('fr', 'French'), ('de', 'German')))
+class MultiLanguageTests(TestCase):
+    def setUp(self):
+        self.obj = ExampleModel.objects.create(name='Hello', description='World')
+        save_translations([(self.obj, {('name', 'es'): 'Hola'})])
+
+    def test_sources_are_read_once_for_all_languages(self):
+        with CaptureQueriesContext(connection) as queries:
+            records = list(get_storage(ExampleModel).fetch_missing(ExampleModel, ['es', 'fr']))
+        # Like a single language: a chunk and the empty query ending the pagination, for both fields.
+        self.assertEqual(len(queries), 4)
+        self.assertCountEqual([(record.field_name, record.language) for record in records],
+                              [('name', 'fr'), ('description', 'es'), ('description', 'fr')])
+
+        records = [record for record in fetch_translatable_fields(['es', 'fr']) if record.object_pk == self.obj.pk]
+        self.assertEqual([(record.field_name, record.language, record.field_value) for record in records],
+                         [('name', 'es', 'Hola'), ('name', 'fr', ''), ('description', 'es', ''),
+                          ('description', 'fr', '')])
+
+    def test_translate_models_command_translates_every_language(self):
+        out = StringIO()
+        call_command('drt_translate_models', language='all', target_language='fr=fr-FR', provider='stub', stdout=out)
+        self.assertDictEqual(get_translation(self.obj, 'description', as_dict=True),
+                             {'es': 'es:World', 'fr': 'fr-FR:World', 'de': 'de:World'})
+        self.assertEqual(get_translation(self.obj, 'name', as_dict=True)['es'], 'Hola')
+        self.assertEqual(out.getvalue().strip().splitlines()[-1],
+                         'Translated 5 fields, reused 0, saved 5, failed 0, retried 0 batches')
+
+    def test_invalid_languages(self):
+        out = StringIO()
+        call_command('drt_translate_models', language='es,it', provider='stub', stdout=out)
+        call_command('drt_translate_models', language='es,fr', target_language='FR', provider='stub', stdout=out)
+        call_command('drt_translate_models', language='es,fr', target_language='it=IT', provider='stub', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), [
+            'Unknown language: it',
+            'Use language=target_language pairs to set target languages of several languages',
+            'Invalid target language: it=IT',
+        ])
+        self.assertFalse(Translation.objects.filter(language='fr').exists())
+
+
+class StaleTranslationsTests(TestCase):
+    def setUp(self):
+        self.obj = ExampleModel.objects.create(name='Hello', description='World')
+        self.table_obj = ExampleTableModel.objects.create(name='Hello', description='World')
+        call_command('drt_translate_models', language='es', provider='stub', stdout=StringIO())
+        ExampleModel.objects.filter(pk=self.obj.pk).update(description='Big world')
+        ExampleTableModel.objects.filter(pk=self.table_obj.pk).update(name='Hi')
+
+    def test_source_hash_is_recorded(self):
+        trans = Translation.objects.get(object_id=str(self.obj.pk), field_name='name', language='es')
+        self.assertEqual(trans.source_hash, hash_source('Hello'))
+        self.assertEqual(len(trans.source_hash), 64)
+
+    def test_queryset_helper(self):
+        self.assertQuerySetEqual(ExampleModel.objects.filter_stale_translations('es'), [self.obj])
+        self.assertFalse(ExampleModel.objects.filter_stale_translations('es', 'name').exists())
+        self.assertQuerySetEqual(ExampleTableModel.objects.filter_stale_translations('es', 'name'), [self.table_obj])
+
+    def test_storages_without_source_hash_have_no_stale_translations(self):
+        obj = ExampleJSONModel.objects.create(name='Hello')
+        save_translations([(obj, {('name', 'es'): 'Hola'})])
+        self.assertFalse(ExampleJSONModel.objects.filter_stale_translations('es').exists())
+
+    def test_translations_without_source_hash_are_not_stale(self):
+        other = ExampleModel.objects.create(name='Other')
+        save_translations([(ExampleModel(pk=other.pk), {('name', 'es'): 'Otro'})])
+        ExampleModel.objects.filter(pk=other.pk).update(name='Changed')
+        self.assertFalse(ExampleModel.objects.filter_stale_translations('es').filter(pk=other.pk).exists())
+
+    def test_unknown_source_hash_keeps_the_stored_one(self):
+        save_translations([(ExampleModel(pk=self.obj.pk), {('name', 'es'): 'Buenas'})])
+        trans = Translation.objects.get(object_id=str(self.obj.pk), field_name='name', language='es')
+        self.assertEqual((trans.field_value, trans.source_hash), ('Buenas', hash_source('Hello')))
+
+    def test_translate_models_command_translates_stale_fields(self):
+        StubTranslationProvider.sent = []
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='stub', stale=True, stdout=out)
+        self.assertCountEqual(StubTranslationProvider.sent, ['Big world', 'Hi'])
+        self.assertEqual(get_translation(self.obj, 'description', as_dict=True)['es'], 'es:Big world')
+        self.assertEqual(get_translation(self.table_obj, 'name', as_dict=True)['es'], 'es:Hi')
+        self.assertFalse(ExampleModel.objects.filter_stale_translations('es').exists())
+        self.assertFalse(ExampleTableModel.objects.filter_stale_translations('es').exists())
+
+
+class TranslationJobTests(TestCase):
+    def setUp(self):
+        self.objects = [ExampleModel.objects.create(name=f'Name {number}') for number in range(3)]
+        StubTranslationProvider.sent = []
+
+    def make_item(self, job, obj, status):
+        return TranslationJobItem.objects.create(
+            job=job, status=status, records=[['example_app.ExampleModel', str(obj.pk), 'name', 'es', obj.name]]
+        )
+
+    def test_run_records_a_job(self):
+        out = StringIO()
+        call_command('drt_translate_models', language='es', provider='stub', stdout=out)
+        job = TranslationJob.objects.get()
+        self.assertEqual(out.getvalue().splitlines()[0], f'Started translation job {job.pk}')
+        self.assertEqual((job.status, job.mode), (TranslationJob.STATUS_COMPLETED, 'missing'))
+        item = job.items.get()
+        self.assertEqual(item.status, TranslationJobItem.STATUS_DONE)
+        self.assertCountEqual(item.results, ['es:Name 0', 'es:Name 1', 'es:Name 2'])
+
+    def test_resume_skips_done_items(self):
+        job = TranslationJob.objects.create(provider='stub', target_languages={'es': 'es'}, mode='all')
+        self.make_item(job, self.objects[0], TranslationJobItem.STATUS_DONE)
+        pending = self.make_item(job, self.objects[1], TranslationJobItem.STATUS_PENDING)
+        out = StringIO()
+        call_command('drt_translate_models', resume=job.pk, stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[0], f'Resuming translation job {job.pk}')
+        self.assertCountEqual(StubTranslationProvider.sent, ['Name 1', 'Name 2'])
+        self.assertFalse(get_translation(self.objects[0], 'name', as_dict=True))
+        self.assertEqual(get_translation(self.objects[1], 'name', as_dict=True)['es'], 'es:Name 1')
+        pending.refresh_from_db()
+        self.assertEqual((pending.status, pending.results), (TranslationJobItem.STATUS_DONE, ['es:Name 1']))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.items.count()), (TranslationJob.STATUS_COMPLETED, 3))
+
+    def test_resume_sends_only_failed_items(self):
+        save_translations([(obj, {('name', 'es'): 'Nombre'}) for obj in self.objects[:2]])
+        job = TranslationJob.objects.create(provider='stub', target_languages={'es': 'es'})
+        self.make_item(job, self.objects[2], TranslationJobItem.STATUS_FAILED)
+        call_command('drt_translate_models', resume=job.pk, stdout=StringIO())
+        self.assertEqual(StubTranslationProvider.sent, ['Name 2'])
+        self.assertEqual(get_translation(self.objects[2], 'name', as_dict=True)['es'], 'es:Name 2')
+
+    def test_resume_after_a_crash_keeps_duplicates_and_memory_hits(self):
+        duplicates = [ExampleModel.objects.create(name='Hello') for __ in range(3)]
+        TranslationMemory.objects.create(
+            key=make_memory_key('Name 0', 'en', 'es', 'stub'), provider='stub', source_language='en',
+            target_language='es', source_text='Name 0', translated_text='Nombre 0'
+        )
+        with mock.patch.object(StubTranslationProvider, 'translate_text', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('drt_translate_models', language='es', provider='stub', stdout=StringIO())
+        job = TranslationJob.objects.get()
+        self.assertTrue(job.items.exists())
+        self.assertFalse(Translation.objects.exists())
+
+        call_command('drt_translate_models', resume=job.pk, stdout=StringIO())
+        self.assertCountEqual(StubTranslationProvider.sent, ['Hello', 'Name 1', 'Name 2'])
+        self.assertEqual([get_translation(obj, 'name', as_dict=True)['es'] for obj in duplicates], ['es:Hello'] * 3)
+        self.assertEqual(get_translation(self.objects[0], 'name', as_dict=True)['es'], 'Nombre 0')
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranslationJob.STATUS_COMPLETED)
+
+    def test_unknown_job(self):
+        out = StringIO()
+        call_command('drt_translate_models', resume=404, stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Unknown translation job: 404')
+
+
+class SpanProtectorTests(TestCase):
+    text = ('Hi {name}, {count, plural, one {# item} other {# items}} in <b class="x">%(place)s</b> for %s. '
+            '50% off {name} <!-- note --> {unbalanced')
+
+    def test_protect_and_restore(self):
+        protector = SpanProtector()
+        text, spans = protector.protect(self.text)
+        self.assertEqual(text, 'Hi __TOKEN1__, __TOKEN2__ item__TOKEN3__ items__TOKEN4__ in '
+                               '__TOKEN5____TOKEN6____TOKEN7__ for __TOKEN8__. '
+                               '50% off __TOKEN9__ __TOKEN10__ {unbalanced')
+        self.assertEqual(spans, ['{name}', '{count, plural, one {#', '} other {#', '}}', '<b class="x">',
+                                 '%(place)s', '</b>', '%s', '{name}', '<!-- note -->'])
+        self.assertEqual(protector.restore(text, spans), self.text)
+        # Providers may move tokens around and change their case or spacing.
+        self.assertEqual(protector.restore('__token9__ y __TOKEN 1__ __TOKEN11__', spans),
+                         '{name} y {name} __TOKEN11__')
+
+    def test_icu_branch_texts_are_translated(self):
+        protector = SpanProtector()
+        source = '{gender, select, female {She has {n, plural, =0 {no {thing}} other {# things}}} other {They}}'
+        text, spans = protector.protect(source)
+        self.assertEqual(text, '__TOKEN1__She has __TOKEN2__no __TOKEN3__ things__TOKEN4__They__TOKEN5__')
+        self.assertEqual(spans, ['{gender, select, female {', '{n, plural, =0 {', '{thing}} other {#',
+                                 '}}} other {', '}}'])
+        self.assertEqual(protector.restore(text, spans), source)
+        # Malformed messages are kept whole.
+        self.assertEqual(protector.protect('{n, plural, one {a} b}'), ('__TOKEN1__', ['{n, plural, one {a} b}']))
+
+    def test_unbalanced_braces(self):
+        protector = SpanProtector()
+        self.assertEqual(protector.protect('{a {b} {{c} d {e'), ('{a __TOKEN1__ {__TOKEN2__ d {e', ['{b}', '{c}']))
+        # Braces are paired once per text, many unclosed ones stay fast.
+        text = 'a{ ' * 20000 + '{name}'
+        self.assertEqual(protector.protect(text), ('a{ ' * 20000 + '__TOKEN1__', ['{name}']))
+
+    def test_printf_conversions_need_a_boundary(self):
+        text, spans = SpanProtector().protect('20%de descuento, %d%% off, %(n)sx')
+        self.assertEqual(text, '20%de descuento, __TOKEN1____TOKEN2__ off, __TOKEN3__x')
+        self.assertEqual(spans, ['%d', '%%', '%(n)s'])
+
+    def test_provider_markup(self):
+        protector = SpanProtector('<x>{}</x>')
+        text, spans = protector.protect('Tom & {name} <i>')
+        self.assertEqual(text, 'Tom &amp; <x>1</x> <x>2</x>')
+        self.assertEqual(protector.restore('TOM & <X> 1 </X> <X>2</X>', spans), 'TOM & {name} <i>')
+
+    def test_utils_functions(self):
+        text, tokens = replace_placeholders_with_tokens('{a} and {a}')
+        self.assertEqual((text, tokens), ('__TOKEN1__ and __TOKEN2__', {'__TOKEN1__': '{a}', '__TOKEN2__': '{a}'}))
+        self.assertEqual(replace_tokens_with_placeholders('__TOKEN2__ y __TOKEN1__', tokens), '{a} y {a}')
+
+    def test_translate_models_command_keeps_placeholders(self):
+        obj = ExampleModel.objects.create(name='Hello {name} &amp; <b>%s</b>')
+        StubTranslationProvider.sent = []
+        call_command('drt_translate_models', language='es', provider='stub', stdout=StringIO())
+        self.assertEqual(StubTranslationProvider.sent, ['Hello __TOKEN1__ &amp; __TOKEN2____TOKEN3____TOKEN4__'])
+        self.assertEqual(get_translation(obj, 'name', as_dict=True)['es'], 'es:Hello {name} & <b>%s</b>')
+
+
+class POBuilderTests(TestCase):
+    def make_po(self):
+        po = polib.POFile()
+        po.header = 'Translations'
+        po.metadata = {'Content-Type': 'text/plain; charset=UTF-8'}
+        po.append(polib.POEntry(msgid='Hello', msgctxt='greeting', msgstr='Hola!', tcomment='examplemodel__name__3'))
+        po.append(polib.POEntry(msgid='Hello', msgstr='Hola', tcomment='examplemodel__name__12'))
+        po.append(polib.POEntry(msgid='Old', msgstr='Viejo', obsolete=True))
+        return po
+
+    def test_entries_are_found_like_polib_does(self):
+        po = self.make_po()
+        builder = POBuilder(po)
+        self.assertIs(builder.add('Hello', 'Otro', 'examplemodel__name__1'), po.find('Hello'))
+        builder.add('Hello', 'Otro', 'examplemodel__name__12')
+        builder.add('Old', '', 'examplemodel__name__4')
+        builder.add('Old', '', 'examplemodel__name__4')
+        with TemporaryDirectory() as directory:
+            builder.save(os.path.join(directory, 'django.po'))
+        self.assertEqual(po.find('Hello').tcomment, 'examplemodel__name__12\nexamplemodel__name__1')
+        self.assertEqual(po.find('Hello').msgstr, 'Hola')
+        new_entry = po.find('Old')
+        self.assertEqual((new_entry.msgstr, new_entry.flags, new_entry.tcomment),
+                         ('', ['fuzzy'], 'examplemodel__name__4'))
+
+    def test_references_are_moved_and_removed(self):
+        po = self.make_po()
+        po.append(polib.POEntry(msgid='Bye', msgstr='Adiós', tcomment='examplemodel__name__5\nexamplemodel__name__6'))
+        builder = POBuilder(po)
+        builder.move('Hi', '', 'examplemodel__name__12')
+        builder.move('Bye', 'Adiós', 'examplemodel__name__7')
+        builder.move('Bye', 'Adiós', 'examplemodel__name__5')
+        builder.remove('examplemodel__name__6')
+        with TemporaryDirectory() as directory:
+            builder.save(os.path.join(directory, 'django.po'))
+        self.assertEqual(po.find('Hi').tcomment, 'examplemodel__name__12')
+        self.assertEqual(po.find('Bye').tcomment, 'examplemodel__name__5\nexamplemodel__name__7')
+        # The entry of 'Hello' without msgctxt has no reference left.
+        self.assertEqual([(entry.msgid, entry.msgstr) for entry in po.obsolete_entries()],
+                         [('Hello', 'Hola'), ('Old', 'Viejo')])
+
+    def test_written_file_matches_polib(self):
+        po = self.make_po()
+        with TemporaryDirectory() as directory:
+            write_po_file(po, os.path.join(directory, 'streamed.po'))
+            po.save(os.path.join(directory, 'polib.po'))
+            with open(os.path.join(directory, 'streamed.po'), encoding='utf-8') as streamed, \
+                    open(os.path.join(directory, 'polib.po'), encoding='utf-8') as saved:
+                self.assertEqual(streamed.read(), saved.read())
+
+
+class MakeMessagesTests(TransactionTestCase):
+    def test_po_files_are_written_for_every_language(self):
+        obj = ExampleModel.objects.create(name='Hello', description='World')
+        other = ExampleModel.objects.create(name='Hello')
+        save_translations([(obj, {('name', 'es'): 'Hola'})])
+        with TemporaryDirectory() as directory, override_settings(BASE_DIR=directory):
+            call_command('drt_makemessages')
+            call_command('drt_makemessages')
+            po = polib.pofile(os.path.join(directory, 'drt_locale', 'es', 'LC_MESSAGES', 'django.po'))
+        self.assertEqual(len(po), 2)
+        self.assertEqual(po.find('Hello').msgstr, 'Hola')
+        self.assertEqual(po.find('Hello').tcomment, f'examplemodel__name__{obj.pk}\nexamplemodel__name__{other.pk}')
+        self.assertEqual((po.find('World').msgstr, po.find('World').flags), ('', ['fuzzy']))
+
+    @override_settings(LANGUAGES=(('en', 'English'), ('es', 'Spanish'), ('fr', 'French')))
+    def test_database_is_read_once_for_all_languages(self):
+        obj = ExampleModel.objects.create(name='Hello')
+        save_translations([(obj, {('name', 'es'): 'Hola', ('name', 'fr'): 'Bonjour'})])
+        with TemporaryDirectory() as directory, override_settings(BASE_DIR=directory):
+            with CaptureQueriesContext(connection) as queries:
+                call_command('drt_makemessages')
+            po_files = {
+                language: polib.pofile(os.path.join(directory, 'drt_locale', language, 'LC_MESSAGES', 'django.po'))
+                for language in ('en', 'es', 'fr')
+            }
+        self.assertEqual(len([query for query in queries if 'examplemodel"' in query['sql']]), 2)
+        self.assertEqual(len([query for query in queries if 'translator_translation"' in query['sql']]), 1)
+        self.assertEqual({language: po.find('Hello').msgstr for language, po in po_files.items()},
+                         {'en': 'Hello', 'es': 'Hola', 'fr': 'Bonjour'})
+
+    @override_settings(DRT_TRACK_CHANGES=True, DRT_WATERMARK_MARGIN=0)
+    def test_incremental_export_merges_changes(self):
+        changed = ExampleModel.objects.create(name='Hello', description='World')
+        deleted = ExampleModel.objects.create(name='Hello')
+        unchanged = ExampleModel.objects.create(name='Stay')
+        with TemporaryDirectory() as directory, override_settings(BASE_DIR=directory):
+            call_command('drt_makemessages')
+            changed.name = 'Hi'
+            changed.description = ''
+            changed.save()
+            deleted.delete()
+            added = ExampleModel.objects.create(name='New')
+            # Created without signals, only its translation tells it changed.
+            bulk = ExampleTableModel.objects.bulk_create([ExampleTableModel(name='Bulk')])[0]
+            save_translations([(bulk, {('name', 'es'): 'Masivo'})])
+            with CaptureQueriesContext(connection) as queries:
+                call_command('drt_makemessages', incremental=True)
+            po = polib.pofile(os.path.join(directory, 'drt_locale', 'es', 'LC_MESSAGES', 'django.po'))
+        object_queries = [query['sql'] for query in queries if 'FROM "example_app_examplemodel"' in query['sql']]
+        self.assertEqual(len(object_queries), 1)
+        self.assertNotIn(str(unchanged.pk), object_queries[0].split(' IN (')[1].split(')')[0].split(', '))
+        self.assertEqual(po.find('Hi').tcomment, f'examplemodel__name__{changed.pk}')
+        self.assertEqual(po.find('New').tcomment, f'examplemodel__name__{added.pk}')
+        self.assertEqual(po.find('Stay').tcomment, f'examplemodel__name__{unchanged.pk}')
+        self.assertEqual(po.find('Bulk').msgstr, 'Masivo')
+        self.assertEqual(sorted(entry.msgid for entry in po.obsolete_entries()), ['Hello', 'World'])
+        self.assertIsNotNone(get_watermark(po))
+
+    @override_settings(DRT_TRACK_CHANGES=True)
+    def test_incremental_export_reads_changes_committed_late(self):
+        with TemporaryDirectory() as directory, override_settings(BASE_DIR=directory):
+            call_command('drt_makemessages')
+            path = os.path.join(directory, 'drt_locale', 'es', 'LC_MESSAGES', 'django.po')
+            watermark = get_watermark(polib.pofile(path))
+            # Stamped before the export read the database, committed after it.
+            late = ExampleModel.objects.create(name='Late')
+            TranslatableObjectChange.objects.filter(object_id=str(late.pk)).update(
+                changed_at=watermark - timedelta(seconds=30))
+            call_command('drt_makemessages', incremental=True)
+            self.assertEqual(polib.pofile(path).find('Late').tcomment, f'examplemodel__name__{late.pk}')
+
+    def test_incremental_export_requires_change_tracking(self):
+        with self.assertRaises(CommandError):
+            call_command('drt_makemessages', incremental=True)
+
+    def test_update_database_skips_deleted_objects(self):
+        obj = ExampleTableModel.objects.create(name='Hello')
+        deleted = ExampleTableModel.objects.create(name='Bye')
+        save_translations([(obj, {('name', 'es'): 'Hola'}), (deleted, {('name', 'es'): 'Adiós'})])
+        translation_model = ExampleTableModel.translation_storage.translation_model
+        with TemporaryDirectory() as directory, override_settings(BASE_DIR=directory):
+            call_command('drt_makemessages')
+            deleted.delete()
+            translation_model.objects.all().delete()
+            call_command('drt_update_database')
+        self.assertEqual(list(translation_model.objects.values_list('master_id', 'field_value')), [(obj.pk, 'Hola')])
+
+    def test_po_round_trip_keeps_source_hashes(self):
+        obj = ExampleModel.objects.create(name='Hello', description='World')
+        table_obj = ExampleTableModel.objects.create(name='Hello')
+        save_translations([(obj, {('name', 'es'): 'Hola', ('description', 'es'): 'Mundo'}),
+                           (table_obj, {('name', 'es'): 'Hola'})])
+        ExampleModel.objects.filter(pk=obj.pk).update(description='Big world')
+        translation_model = ExampleTableModel.translation_storage.translation_model
+        rows = list(Translation.objects.order_by('pk').values_list('source_hash', 'updated_at'))
+        table_rows = list(translation_model.objects.order_by('pk').values_list('source_hash', 'updated_at'))
+        with TemporaryDirectory() as directory, override_settings(BASE_DIR=directory):
+            call_command('drt_makemessages')
+            call_command('drt_update_database')
+        self.assertEqual(list(Translation.objects.order_by('pk').values_list('source_hash', 'updated_at')), rows)
+        self.assertEqual(list(translation_model.objects.order_by('pk').values_list('source_hash', 'updated_at')),
+                         table_rows)
+        self.assertEqual([(record.model, record.field_name) for record in fetch_stale_translations('es')],
+                         [(ExampleModel, 'description')])
+
+
+@override_settings(DRT_TRACK_CHANGES=True)
+class ObjectChangeTests(TestCase):
+    def assert_recorded_changes(self):
+        obj = ExampleModel.objects.create(name='Hello')
+        other = ExampleModel.objects.create(name='Bye')
+        first_change = TranslatableObjectChange.objects.get(object_id=str(obj.pk))
+        obj.save()
+        other_pk = other.pk
+        other.delete()
+        changes = {change.object_id: change for change in TranslatableObjectChange.objects.all()}
+        self.assertEqual(len(changes), 2)
+        self.assertFalse(changes[str(obj.pk)].deleted)
+        self.assertGreaterEqual(changes[str(obj.pk)].changed_at, first_change.changed_at)
+        self.assertTrue(changes[str(other_pk)].deleted)
+
+    def test_changes_are_recorded(self):
+        self.assert_recorded_changes()
+
+    def test_fallback_without_conflict_support(self):
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            self.assert_recorded_changes()
+
+    def test_bulk_writes_are_recorded(self):
+        obj = ExampleJSONModel.objects.create(name='Hello', translation_values={'name': {'es': 'Hola'}})
+        TranslatableObjectChange.objects.all().delete()
+        # Neither bulk_create nor update send post_save.
+        serializer = ExampleModelTranslatableWritableDBDictSerializer(data=[
+            {'name': {'en': f'Item {number}', 'es': f'Artículo {number}'}} for number in range(3)
+        ], many=True)
+        serializer.is_valid(raise_exception=True)
+        instances = serializer.save()
+        get_storage(ExampleJSONModel).delete(ExampleJSONModel, [obj.pk])
+        self.assertCountEqual(
+            TranslatableObjectChange.objects.filter(deleted=False).values_list('content_type__model', 'object_id'),
+            [('examplemodel', str(instance.pk)) for instance in instances] + [('examplejsonmodel', str(obj.pk))]
+        )
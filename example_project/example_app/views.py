@@ -1,5 +1,7 @@
 from rest_framework import generics
 
+from django_restful_translator.drf.filters import TranslatedOrderingFilter, TranslatedSearchFilter
+
 from .models import ExampleModel
 from .serializers import (
     ExampleModelTranslatableDBSerializer,
@@ -15,6 +17,14 @@ class ExampleModelTranslatableDBView(generics.ListCreateAPIView):
     serializer_class = ExampleModelTranslatableDBSerializer
 
 
+class ExampleModelTranslatableDBFilteredView(generics.ListAPIView):
+    queryset = ExampleModel.objects.all()
+    serializer_class = ExampleModelTranslatableDBSerializer
+    filter_backends = [TranslatedOrderingFilter, TranslatedSearchFilter]
+    ordering_fields = ['id', 'name', 'description']
+    search_fields = ['name', 'description']
+
+
 class ExampleModelTranslatableDBDictView(generics.ListCreateAPIView):
     queryset = ExampleModel.objects.all()
     serializer_class = ExampleModelTranslatableDBDictSerializer